@@ -0,0 +1,58 @@
+import numpy as np
+from distributions import cumulative_masses
+from schedules import horizon_day_type_probs
+from simulation import cumulative_day_type_probs, replicate_means, replicate_size
+
+
+def demand_mixture(day_type_probs, cum_demand_dist):
+    cum_day_type_prob = cumulative_day_type_probs(day_type_probs)
+    day_type_masses, day_type_rest = cumulative_masses(list(cum_day_type_prob.values()))
+    # Randoms past the last cumulative day-type probability fall back to the last type, as in the sampler.
+    day_type_masses[-1] += day_type_rest
+    mixture = {}
+    for day_type, day_type_mass in zip(cum_day_type_prob, day_type_masses):
+        table = sorted(cum_demand_dist.get(day_type, {}).items())
+        demand_masses, demand_rest = cumulative_masses([cum_prob for _, cum_prob in table])
+        for (demand, _), mass in zip(table, demand_masses):
+            mixture[demand] = mixture.get(demand, 0.0) + day_type_mass * mass
+        mixture[0] = mixture.get(0, 0.0) + day_type_mass * demand_rest
+    demands = np.array(sorted(d for d, mass in mixture.items() if mass > 0), dtype=np.int64)
+    return demands, np.array([mixture[d] for d in demands.tolist()])
+
+
+def expected_outcomes(params, cum_demand_dist, quantities):
+    p, c, s = params["Paper Sell Price"], params["Paper Cost"], params["Scrap Sale Price"]
+    demands, probs = demand_mixture(horizon_day_type_probs(params), cum_demand_dist)
+    q = np.atleast_1d(np.asarray(quantities, dtype=np.int64))[:, None]
+    sold = probs @ np.minimum(demands, q).T
+    excess_demand = probs @ np.maximum(0, demands - q).T
+    scraps = probs @ np.maximum(0, q - demands).T
+    q = q[:, 0]
+    return {
+        "Quantity": q, "Expected Profit": sold * p - q * c + scraps * s,
+        "Expected Lost Profit": excess_demand * (p - c), "Expected Scraps": scraps
+    }
+
+
+def critical_fractile(p, c, s):
+    return (p - c) / (p - s)
+
+
+def optimal_quantity(params, cum_demand_dist):
+    demands, probs = demand_mixture(horizon_day_type_probs(params), cum_demand_dist)
+    ratio = critical_fractile(params["Paper Sell Price"], params["Paper Cost"], params["Scrap Sale Price"])
+    # Smallest demand level whose cumulative probability reaches the critical fractile (with float slack).
+    idx = np.searchsorted(np.cumsum(probs), ratio - 1e-12, side="left")
+    return int(demands[min(idx, len(demands) - 1)])
+
+
+def validate_monte_carlo(params, cum_demand_dist, store):
+    exact = float(expected_outcomes(params, cum_demand_dist, [params["Quantity"]])["Expected Profit"][0])
+    estimate = float(store.average_profit.mean())
+    replicates = replicate_means(store.average_profit, replicate_size(params.get("Sampling", "Plain")))
+    std_error = float(replicates.std(ddof=1) / np.sqrt(len(replicates))) if len(replicates) > 1 else float("nan")
+    return {
+        "Exact Daily Profit": exact, "Monte Carlo Daily Profit": estimate, "Error": estimate - exact,
+        "Relative Error": (estimate - exact) / exact if exact else float("nan"),
+        "Standard Errors": (estimate - exact) / std_error if std_error else float("nan")
+    }
@@ -0,0 +1,112 @@
+import argparse
+import copy
+import csv
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from distributions import DemandTables, load_distribution, parse_distribution, validate_distribution
+from export import PERIOD_FIELDS, export_csv
+from schedules import parse_schedule, validate_schedule
+from simulation import DEFAULT_DEMAND_DIST, DEFAULT_PARAMETERS, SAMPLING_MODES, build_results, cumulative_demand_dist, new_seed, simulate
+
+log = logging.getLogger("batch")
+
+SUMMARY_FIELDS = [
+    "Scenario", "Source", "Paper Sell Price", "Paper Cost", "Scrap Sale Price", "Days", "Quantity", "Iterations", "Seed", "Sampling",
+    "Average Daily Profit", "Average Total Profit", "Min Profit", "Max Profit", "Confidence Half-Width", "Iterations Used",
+    "Variance Reduction", "P5", "P50", "P95", "Value at Risk (95%)", "Probability of Loss"
+]
+
+
+def parse_scenario(data, name="scenario", base_dir="."):
+    if "Distribution File" in data:
+        # Inline keys in the scenario override the tables loaded from the file.
+        day_type_probs, demand_dist = load_distribution(os.path.join(base_dir, data["Distribution File"]))
+        data = dict({"Day Type Probabilities": day_type_probs, "Demand Distribution": demand_dist}, **data)
+    params = copy.deepcopy(DEFAULT_PARAMETERS)
+    params.update({key: value for key, value in data.items() if key in DEFAULT_PARAMETERS})
+    params["Days"], params["Quantity"], params["Iterations"] = int(params["Days"]), int(params["Quantity"]), int(params["Iterations"])
+    if params["Seed"] is None:
+        params["Seed"] = new_seed()
+    if params["Sampling"] not in SAMPLING_MODES:
+        raise ValueError(f"{name}: unknown sampling mode {params['Sampling']!r}, expected one of {', '.join(SAMPLING_MODES)}")
+    params["Day Type Probabilities"], demand_dist = parse_distribution(data, params["Day Type Probabilities"], DEFAULT_DEMAND_DIST)
+    try:
+        params["Day Type Schedule"] = parse_schedule(params["Day Type Schedule"], params["Day Type Probabilities"])
+        validate_distribution(params["Day Type Probabilities"], demand_dist)
+        validate_schedule(params["Day Type Schedule"], params["Day Type Probabilities"])
+    except ValueError as error:
+        raise ValueError(f"{name}: {error}") from None
+    return {"Scenario": data.get("Name", name), "Parameters": params, "Demand Distribution": demand_dist}
+
+
+def load_scenarios(path):
+    files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".json")) if os.path.isdir(path) else [path]
+    scenarios = []
+    for file in files:
+        with open(file) as f:
+            data = json.load(f)
+        stem = os.path.splitext(os.path.basename(file))[0]
+        entries = data if isinstance(data, list) else [data]
+        for i, entry in enumerate(entries):
+            scenario = parse_scenario(entry, stem if len(entries) == 1 else f"{stem}-{i + 1}", os.path.dirname(file))
+            scenario["Source"] = file
+            scenarios.append(scenario)
+    return scenarios
+
+
+def run_scenario(scenario, detail_dir=None):
+    params = scenario["Parameters"]
+    store = simulate(params, DemandTables(cumulative_demand_dist(scenario["Demand Distribution"])))
+    results = build_results(params, store)
+    summary = results["Summary"]
+    if detail_dir:
+        export_csv(os.path.join(detail_dir, f"{scenario['Scenario']}.csv"), store)
+    row = {"Scenario": scenario["Scenario"], "Source": scenario["Source"]}
+    row.update({field: params[field] for field in SUMMARY_FIELDS if field in params})
+    row.update({field: summary[field] for field in SUMMARY_FIELDS if field in summary})
+    return row, results.get("Period Breakdown", [])
+
+
+def run_batch(scenarios, output, workers=1, detail_dir=None, periods=None):
+    if detail_dir:
+        os.makedirs(detail_dir, exist_ok=True)
+    started = time.perf_counter()
+    with open(output, "w", newline="") as csvfile, open(periods or os.devnull, "w", newline="") as periods_file:
+        writer = csv.DictWriter(csvfile, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        # Scenarios with a day type schedule also add one row per schedule period.
+        periods_writer = csv.DictWriter(periods_file, fieldnames=["Scenario"] + PERIOD_FIELDS)
+        periods_writer.writeheader()
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(scenarios))) if workers > 1 and len(scenarios) > 1 else None
+        try:
+            run = executor.map if executor else map
+            for row, breakdown in run(run_scenario, scenarios, repeat(detail_dir)):
+                writer.writerow(row)
+                periods_writer.writerows(dict(period, Scenario=row["Scenario"]) for period in breakdown)
+                log.info("%s: Avg. Daily Profit $%.4f", row["Scenario"], row["Average Daily Profit"])
+        finally:
+            if executor:
+                executor.shutdown()
+    elapsed = time.perf_counter() - started
+    log.info("Ran %d scenarios in %.2fs (%.2f scenarios/s)", len(scenarios), elapsed, len(scenarios) / elapsed if elapsed else float("inf"))
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run newspaper seller scenarios without the desktop app.")
+    parser.add_argument("scenarios", help="scenario JSON file or directory of JSON files")
+    parser.add_argument("-o", "--output", default="summary.csv", help="summary CSV, one row per scenario")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="scenarios run concurrently")
+    parser.add_argument("--detail", metavar="DIR", help="also write per-day results for every scenario into DIR")
+    parser.add_argument("--periods", metavar="CSV", help="also write profit per schedule period for scenarios with a Day Type Schedule")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    run_batch(load_scenarios(args.scenarios), args.output, args.workers, args.detail, args.periods)
+
+
+if __name__ == "__main__":
+    main()
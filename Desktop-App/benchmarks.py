@@ -0,0 +1,115 @@
+import argparse
+import gc
+import itertools
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+from distributions import DemandTables
+from schedules import parse_schedule
+from simulation import DEFAULT_DEMAND_DIST, DEFAULT_PARAMETERS, ENGINE_VERSION, cumulative_demand_dist, simulate, sweep_quantities
+
+GRIDS = {
+    "quick": {"Days": [30, 365], "Iterations": [100, 1000], "Sweep Widths": [7, 61]},
+    "full": {"Days": [30, 365, 1825], "Iterations": [100, 1000, 10000], "Sweep Widths": [7, 61, 241]}
+}
+
+
+def measure(function, repeats):
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    _, peak = tracemalloc.get_traced_memory()
+    # Blocks traced since start() that are still allocated while the result is held, NumPy buffers included.
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    tracemalloc.stop()
+    live_blocks = sum(stat.count for stat in snapshot.statistics("lineno"))
+    del result
+    return {"Best Seconds": min(times), "Median Seconds": float(np.median(times)), "Peak Bytes": peak, "Live Blocks": live_blocks}
+
+
+def benchmark_cases(grid, workers):
+    cum_demand_dist = DemandTables(cumulative_demand_dist(DEFAULT_DEMAND_DIST))
+    # A weekly day-type schedule should cost the same per day as constant probabilities.
+    weekly = parse_schedule({"Weekdays": {"Saturday": {"Good": 0.6, "Fair": 0.4}, "Sunday": {"Good": 0.7, "Fair": 0.3}}},
+                            DEFAULT_PARAMETERS["Day Type Probabilities"])
+    for days, iterations in itertools.product(grid["Days"], grid["Iterations"]):
+        params = dict(DEFAULT_PARAMETERS, Days=days, Iterations=iterations, Seed=1)
+        yield {"Case": "simulate", "Days": days, "Iterations": iterations, "Quantities": 1}, \
+            lambda params=params: simulate(params, cum_demand_dist, workers)
+        scheduled = dict(params, **{"Day Type Schedule": weekly})
+        yield {"Case": "schedule", "Days": days, "Iterations": iterations, "Quantities": 1}, \
+            lambda params=scheduled: simulate(params, cum_demand_dist, workers)
+        for width in grid["Sweep Widths"]:
+            quantities = np.linspace(40, 100, width).round().astype(int)
+            yield {"Case": "sweep", "Days": days, "Iterations": iterations, "Quantities": width}, \
+                lambda params=params, quantities=quantities: sweep_quantities(params, cum_demand_dist, quantities, workers)
+
+
+def run_benchmarks(grid, repeats=3, workers=1):
+    results = []
+    for case, function in benchmark_cases(grid, workers):
+        case.update(measure(function, repeats))
+        case["Simulated Days per Second"] = case["Days"] * case["Iterations"] * case["Quantities"] / case["Best Seconds"]
+        print(f"{case['Case']:>8} days={case['Days']:<5} iterations={case['Iterations']:<6} quantities={case['Quantities']:<4}"
+              f" {case['Best Seconds'] * 1000:10.1f} ms {case['Peak Bytes'] / 2**20:8.1f} MB {case['Live Blocks']:>7} live blocks")
+        results.append(case)
+    return {
+        "Engine Version": ENGINE_VERSION, "Timestamp": datetime.now(timezone.utc).isoformat(), "Python": sys.version.split()[0],
+        "NumPy": np.__version__, "Platform": platform.platform(), "Workers": workers, "Repeats": repeats, "Results": results
+    }
+
+
+def case_id(case):
+    return case["Case"], case["Days"], case["Iterations"], case["Quantities"]
+
+
+def compare(baseline_path, current_path, threshold=0.10, min_seconds=0.005):
+    with open(baseline_path) as f:
+        baseline = {case_id(case): case for case in json.load(f)["Results"]}
+    with open(current_path) as f:
+        current = json.load(f)["Results"]
+    regressions = 0
+    for case in current:
+        old = baseline.get(case_id(case))
+        if old is None:
+            continue
+        time_ratio = case["Best Seconds"] / old["Best Seconds"]
+        memory_ratio = case["Peak Bytes"] / old["Peak Bytes"] if old["Peak Bytes"] else 1.0
+        # Millisecond-scale cases are mostly timer noise, so a slowdown must also exceed min_seconds.
+        slower = time_ratio > 1 + threshold and case["Best Seconds"] - old["Best Seconds"] > min_seconds
+        flag = "REGRESSION" if slower or memory_ratio > 1 + threshold else ""
+        regressions += bool(flag)
+        print(f"{case['Case']:>8} days={case['Days']:<5} iterations={case['Iterations']:<6} quantities={case['Quantities']:<4}"
+              f" time x{time_ratio:5.2f} memory x{memory_ratio:5.2f} {flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation engine without a display.")
+    parser.add_argument("--grid", choices=sorted(GRIDS), default="quick")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("-o", "--output", default="benchmark.json", help="machine-readable results file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two results files instead of running")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown counted as a regression")
+    parser.add_argument("--min-seconds", type=float, default=0.005, help="absolute slowdown a regression must also exceed")
+    args = parser.parse_args(argv)
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold, args.min_seconds) else 0)
+    report = run_benchmarks(GRIDS[args.grid], args.repeats, args.workers)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {len(report['Results'])} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+from export import load_npz, save_npz
+from simulation import ENGINE_VERSION
+
+DEFAULT_CACHE_DIR = os.environ.get("NEWSPAPER_SELLER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "newspaper-seller"))
+
+
+def cache_key(params, demand_dist):
+    if params.get("Seed") is None:
+        return None
+    canonical = {
+        "Engine Version": ENGINE_VERSION, "Parameters": params,
+        "Demand Distribution": {day_type: {str(d): prob for d, prob in sorted(table.items())} for day_type, table in demand_dist.items()}
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+def store_nbytes(store):
+    return sum(column.nbytes for column in store.columns.values())
+
+
+class ResultCache:
+    def __init__(self, max_bytes=256 * 2**20, directory=DEFAULT_CACHE_DIR, max_disk_bytes=2 * 2**30):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        if key is None:
+            return None, None
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return self.memory[key], "memory"
+        store = self.load(key)
+        with self.lock:
+            if store is None:
+                self.misses += 1
+                return None, None
+            self.hits += 1
+            self.remember(key, store)
+            return store, "disk"
+
+    def put(self, key, store):
+        # A disk-backed store already lives in its own files and may be far larger than the cache.
+        if key is None or store.directory is not None:
+            return
+        with self.lock:
+            self.remember(key, store)
+        self.save(key, store)
+
+    def remember(self, key, store):
+        nbytes = store_nbytes(store)
+        if nbytes > self.max_bytes:
+            return
+        if key in self.memory:
+            self.memory_bytes -= store_nbytes(self.memory.pop(key))
+        self.memory[key] = store
+        self.memory_bytes += nbytes
+        while self.memory_bytes > self.max_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= store_nbytes(evicted)
+
+    def load(self, key):
+        try:
+            os.utime(self.path(key))
+            return load_npz(self.path(key))
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def save(self, key, store):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = self.path(key) + ".tmp"
+            with open(temp_path, "wb") as f:
+                save_npz(f, store)
+            os.replace(temp_path, self.path(key))
+            self.prune()
+        except OSError:
+            pass
+
+    def prune(self):
+        entries = sorted((entry for entry in os.scandir(self.directory) if entry.name.endswith(".npz")), key=lambda e: e.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total <= self.max_disk_bytes:
+                break
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def status(self):
+        return f"Cache: {self.hits} hits / {self.misses} misses"
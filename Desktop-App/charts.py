@@ -0,0 +1,112 @@
+import copy
+import numpy as np
+from matplotlib.collections import LineCollection
+from profiling import count
+
+MAX_BARS = 365
+MAX_GROUPED_LEVELS = 30
+
+
+def aggregate_days(profits, max_bars=MAX_BARS):
+    # Long horizons are shown as one bar per block of days: the block mean, plus its min-max range.
+    days = len(profits)
+    block = -(-days // max_bars) if days > max_bars else 1
+    starts = np.arange(0, days, block)
+    sizes = np.diff(np.append(starts, days))
+    means = np.add.reduceat(profits, starts) / sizes
+    return block, starts + 1, sizes, means, np.minimum.reduceat(profits, starts), np.maximum.reduceat(profits, starts)
+
+
+class DailyProfitChart:
+    def __init__(self, ax, canvas, max_bars=MAX_BARS):
+        self.ax = ax
+        self.canvas = canvas
+        self.max_bars = max_bars
+        self.days = None
+        self.bars = []
+        self.ranges = None
+        self.average_line = None
+
+    def build(self, days):
+        # Artists are created once per horizon; switching iterations only moves them.
+        self.ax.clear()
+        block, starts, sizes, means, _, _ = aggregate_days(np.zeros(days), self.max_bars)
+        label = "Daily Profit" if block == 1 else f"Mean Profit per {block} Days"
+        self.bars = list(self.ax.bar(starts + (sizes - 1) / 2, means, sizes * 0.8, color="skyblue", label=label))
+        self.ranges = self.ax.add_collection(LineCollection([], colors="steelblue", linewidths=0.8, alpha=0.5,
+                                                         label="Min-Max Range" if block > 1 else "_nolegend_"))
+        self.ranges.set_visible(block > 1)
+        self.average_line = self.ax.axhline(y=0, color="r", linestyle="-")
+        self.ax.set(xlabel="Day", ylabel="Profit ($)", xlim=(0.5, days + 0.5))
+        self.days = days
+
+    def update(self, profits, average, iteration):
+        if len(profits) != self.days:
+            self.build(len(profits))
+        block, starts, sizes, means, lows, highs = aggregate_days(profits, self.max_bars)
+        for bar, height in zip(self.bars, means.tolist()):
+            bar.set_height(height)
+        if block > 1:
+            x = starts + (sizes - 1) / 2
+            self.ranges.set_segments(np.stack([np.column_stack([x, lows]), np.column_stack([x, highs])], axis=1))
+        self.average_line.set_ydata([average, average])
+        self.average_line.set_label(f"Avg: ${average:.2f}")
+        low, high = min(lows.min(), average, 0.0), max(highs.max(), average, 0.0)
+        margin = (high - low) * 0.05 or 1.0
+        self.ax.set_ylim(low - margin, high + margin)
+        self.ax.set_title(f"Daily Profits (Iteration {iteration + 1})")
+        self.ax.legend(loc="upper right")
+        count("Chart Bars Updated", len(self.bars))
+        self.canvas.draw_idle()
+
+
+class DemandChart:
+    def __init__(self, ax, canvas):
+        self.ax = ax
+        self.canvas = canvas
+        self.drawn = None
+
+    def update(self, demand_dist):
+        if demand_dist == self.drawn:
+            return False
+        self.ax.clear()
+        demands = sorted({demand for table in demand_dist.values() for demand in table})
+        if len(demands) > MAX_GROUPED_LEVELS:
+            # Fine-grained tables read better as one step line per day type than as hundreds of grouped bars.
+            for day_type, table in demand_dist.items():
+                self.ax.plot(demands, [table.get(d, 0.0) for d in demands], drawstyle="steps-mid", label=day_type)
+        else:
+            width = 0.8 / max(len(demand_dist), 1)
+            for i, (day_type, table) in enumerate(demand_dist.items()):
+                self.ax.bar(np.arange(len(demands)) + i * width, [table.get(d, 0.0) for d in demands], width, label=day_type)
+            self.ax.set_xticks(np.arange(len(demands)) + width * (len(demand_dist) - 1) / 2, demands)
+        self.ax.set(xlabel="Demand", ylabel="Probability", title="Demand Distribution by Day Type")
+        self.ax.legend()
+        self.canvas.draw_idle()
+        self.drawn = copy.deepcopy(demand_dist)
+        return True
+
+
+class ProfitDistributionChart:
+    def __init__(self, ax, canvas):
+        self.ax = ax
+        self.canvas = canvas
+
+    def update(self, distribution, summary):
+        # Drawn from the merged histogram and sketch, so the chart costs the same for any number of iterations.
+        self.ax.clear()
+        edges, counts = distribution.histogram.edges, distribution.histogram.counts
+        share = counts / max(distribution.count, 1)
+        colors = np.where(edges[1:] <= 0, "salmon", "skyblue")
+        self.ax.bar(edges[:-1], share, np.diff(edges), align="edge", color=colors, edgecolor="white", linewidth=0.5)
+        for name, style in (("P5", ":"), ("P50", "-"), ("P95", ":")):
+            self.ax.axvline(summary[name], color="black", linestyle=style, label=f"{name}: ${summary[name]:.2f}")
+        self.ax.set(xlabel="Total Profit per Iteration ($)", ylabel="Share of Iterations",
+                    title=f"Profit Distribution | VaR (95%): ${summary['Value at Risk (95%)']:.2f} | "
+                          f"P(Loss): {summary['Probability of Loss']:.2%}")
+        # Bins that never fill are trimmed from the view; the bin edges themselves stay fixed.
+        filled = np.flatnonzero(counts)
+        if len(filled):
+            self.ax.set_xlim(edges[filled[0]], edges[filled[-1] + 1])
+        self.ax.legend(loc="upper right")
+        self.canvas.draw_idle()
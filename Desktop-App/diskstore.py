@@ -0,0 +1,82 @@
+import json
+import operator
+import os
+import numpy as np
+
+METADATA_FILE = "store.json"
+
+
+def column_path(directory, name):
+    return os.path.join(directory, name.lower().replace(" ", "_") + ".npy")
+
+
+class MappedColumn:
+    # An (iterations, days) column kept in a .npy file. Every access maps only the rows it touches and unmaps them
+    # straight after, so reading or writing any part of a huge run leaves resident memory flat.
+    def __init__(self, path, rows=None):
+        self.path = path
+        with open(path, "rb") as f:
+            major, _ = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if major == 1 else np.lib.format.read_array_header_2_0
+            shape, _, self.dtype = read_header(f)
+            self.offset = f.tell()
+        self.shape = (shape[0] if rows is None else rows,) + tuple(shape[1:])
+        self.ndim = len(self.shape)
+        self.row_bytes = int(np.prod(self.shape[1:])) * self.dtype.itemsize
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def nbytes(self):
+        return len(self) * self.row_bytes
+
+    def map(self, start, stop, mode="r"):
+        return np.memmap(self.path, dtype=self.dtype, mode=mode, offset=self.offset + start * self.row_bytes, shape=(stop - start,) + self.shape[1:])
+
+    def read(self, start, stop):
+        if stop <= start:
+            return np.empty((0,) + self.shape[1:], dtype=self.dtype)
+        return np.array(self.map(start, stop))
+
+    def write(self, start, values):
+        mapped = self.map(start, start + len(values), "r+")
+        mapped[:] = values
+        mapped.flush()
+
+    def __getitem__(self, key):
+        rows, rest = (key[0], key[1:]) if isinstance(key, tuple) else (key, ())
+        if isinstance(rows, slice):
+            start, stop, step = rows.indices(len(self))
+            return self.read(start, max(start, stop))[::step][(slice(None),) + rest]
+        row = operator.index(rows)
+        row += len(self) if row < 0 else 0
+        if not 0 <= row < len(self):
+            raise IndexError(f"iteration {rows} is out of range for {len(self)} iterations")
+        return self.read(row, row + 1)[0][rest]
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.read(0, len(self))
+        return array if dtype is None else array.astype(dtype)
+
+
+def create_columns(directory, dtypes, iterations, days):
+    os.makedirs(directory, exist_ok=True)
+    columns = {}
+    for name, dtype in dtypes.items():
+        # open_memmap only writes the header; the rest of the file stays sparse until chunks land in it.
+        np.lib.format.open_memmap(column_path(directory, name), mode="w+", dtype=dtype, shape=(iterations, days)).flush()
+        columns[name] = MappedColumn(column_path(directory, name))
+    return columns
+
+
+def save_metadata(directory, day_types, days, rows):
+    with open(os.path.join(directory, METADATA_FILE), "w") as f:
+        json.dump({"Day Types": day_types, "Days": days, "Iterations": rows}, f)
+
+
+def open_columns(directory, names):
+    with open(os.path.join(directory, METADATA_FILE)) as f:
+        metadata = json.load(f)
+    columns = {name: MappedColumn(column_path(directory, name), metadata["Iterations"]) for name in names}
+    return columns, metadata["Day Types"], metadata["Days"]
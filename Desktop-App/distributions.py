@@ -0,0 +1,171 @@
+import json
+import numpy as np
+
+
+def cumulative_masses(cum_probs):
+    # Probability mass that the inverse-CDF lookup assigns to each entry; randoms are drawn from [0, 1).
+    cum = np.minimum(np.asarray(cum_probs, dtype=np.float64), 1.0)
+    return np.diff(cum, prepend=0.0), 1.0 - (cum[-1] if len(cum) else 0.0)
+
+
+class AliasTable:
+    # Vose's alias method over one distribution per row: a draw picks a column, then keeps it or takes its alias.
+    def __init__(self, values, masses):
+        masses = np.maximum(np.atleast_2d(np.asarray(masses, dtype=np.float64)), 0.0)
+        self.values = np.atleast_2d(values)
+        self.threshold = np.ones(masses.shape)
+        self.alias = np.tile(np.arange(masses.shape[1]), (masses.shape[0], 1))
+        for row, row_masses in enumerate(masses):
+            self.build_row(row, row_masses)
+
+    def build_row(self, row, masses):
+        total = masses.sum()
+        if not total:
+            return
+        scaled = (masses * (len(masses) / total)).tolist()
+        small = [i for i, mass in enumerate(scaled) if mass < 1.0]
+        large = [i for i, mass in enumerate(scaled) if mass >= 1.0]
+        while small and large:
+            short, tall = small.pop(), large.pop()
+            self.threshold[row, short] = scaled[short]
+            self.alias[row, short] = tall
+            scaled[tall] -= 1.0 - scaled[short]
+            (small if scaled[tall] < 1.0 else large).append(tall)
+        # Whatever is left is full up to rounding and keeps its own column.
+
+    def sample(self, rnd, rows=0):
+        columns = self.threshold.shape[1]
+        scaled = rnd * columns
+        column = np.minimum(scaled.astype(np.intp), columns - 1)
+        # Flat offsets into the tables: one take per lookup is cheaper than indexing rows and columns separately.
+        base = np.asarray(rows) * columns
+        index = base + column
+        keep = scaled - column < self.threshold.take(index)
+        return self.values.take(np.where(keep, index, base + self.alias.take(index)))
+
+
+class InverseCdfTable:
+    # The original loop's lookup over one distribution per row: a random takes the first entry whose cumulative
+    # probability exceeds it, or the fallback past the last one. A guide table over power-of-two buckets of [0, 1)
+    # says where that search starts, so a draw costs a comparison or two whatever the table size.
+    def __init__(self, values, cum, fallback):
+        width = max((len(row) for row in cum), default=0) + 1
+        self.buckets = 1 << max(6, int(np.ceil(np.log2(4 * width))))
+        # The padding column never compares below a random, so every search stops on it at the latest.
+        self.values = np.full((len(cum), width), fallback, dtype=np.int64)
+        self.cum = np.full((len(cum), width), np.inf)
+        self.guide = np.zeros((len(cum), self.buckets), dtype=np.intp)
+        self.steps = 0
+        edges = np.arange(self.buckets + 1) / self.buckets
+        for row, (row_values, row_cum) in enumerate(zip(values, cum)):
+            row_cum = np.asarray(row_cum, dtype=np.float64)
+            self.values[row, :len(row_cum)] = row_values
+            self.cum[row, :len(row_cum)] = row_cum
+            starts = np.searchsorted(row_cum, edges[:-1], side="right")
+            self.guide[row] = starts
+            # A random in bucket b is below (b + 1) / buckets, so only entries under that edge can be left to pass.
+            self.steps = max(self.steps, int((np.searchsorted(row_cum, edges[1:], side="left") - starts).max(initial=0)))
+
+    def sample(self, rnd, rows=0):
+        # Scaling by a power of two is exact, so a random always lands in the bucket that holds it.
+        bucket = np.minimum((rnd * self.buckets).astype(np.intp), self.buckets - 1)
+        rows = np.asarray(rows)
+        base = rows * self.cum.shape[1]
+        index = self.guide.take(rows * self.buckets + bucket)
+        for _ in range(self.steps):
+            index += self.cum.take(base + index) <= rnd
+        return self.values.take(base + index)
+
+
+class DemandTables(dict):
+    # The cumulative demand tables, plus the inverse-CDF and alias tables built once from them; all travel to workers together.
+    def __init__(self, cum_demand_dist):
+        super().__init__(cum_demand_dist)
+        self.rows = {day_type: row for row, day_type in enumerate(self)}
+        width = max((len(table) for table in dict.values(self)), default=0) + 1
+        values = np.zeros((len(self) + 1, width), dtype=np.int64)
+        masses = np.zeros((len(self) + 1, width))
+        for row, table in enumerate(dict.values(self)):
+            entries = sorted(table.items())
+            row_masses, rest = cumulative_masses([cum_prob for _, cum_prob in entries])
+            values[row, :len(entries)] = [demand for demand, _ in entries]
+            masses[row, :len(entries)] = row_masses
+            # The last column holds demand 0: what a random past the last cumulative probability gets.
+            masses[row, -1] = rest
+        # The extra last row serves day types that have no demand table at all.
+        masses[-1, -1] = 1.0
+        self.alias = AliasTable(values, masses)
+        entries = [sorted(table.items()) for table in dict.values(self)] + [[]]
+        self.inverse = InverseCdfTable([[demand for demand, _ in table] for table in entries],
+                                       [[cum_prob for _, cum_prob in table] for table in entries], 0)
+
+    def rows_for(self, day_types):
+        return np.array([self.rows.get(day_type, len(self)) for day_type in day_types], dtype=np.intp)
+
+
+def as_demand_tables(cum_demand_dist):
+    return cum_demand_dist if isinstance(cum_demand_dist, DemandTables) else DemandTables(cum_demand_dist)
+
+
+def parse_distribution(data, day_type_probs=None, demand_dist=None):
+    # JSON object keys are strings, demand levels are ints.
+    demand_dist = {
+        day_type: {int(demand): float(prob) for demand, prob in table.items()}
+        for day_type, table in data.get("Demand Distribution", demand_dist or {}).items()
+    }
+    day_type_probs = {day_type: float(prob) for day_type, prob in data.get("Day Type Probabilities", day_type_probs or {}).items()}
+    return day_type_probs, demand_dist
+
+
+def validate_distribution(day_type_probs, demand_dist, tolerance=1e-3):
+    if abs(sum(day_type_probs.values()) - 1.0) > tolerance:
+        raise ValueError("Day type probabilities must sum to 1.")
+    for day_type, prob in day_type_probs.items():
+        if prob < 0:
+            raise ValueError(f"{day_type} day probability cannot be negative.")
+        if day_type not in demand_dist:
+            raise ValueError(f"{day_type} days have no demand table.")
+    validate_demand_tables(demand_dist, tolerance)
+
+
+def validate_demand_tables(demand_dist, tolerance=1e-3):
+    for day_type, table in demand_dist.items():
+        if any(demand < 0 for demand in table) or any(prob < 0 for prob in table.values()):
+            raise ValueError(f"{day_type} demand levels and probabilities cannot be negative.")
+        if abs(sum(table.values()) - 1.0) > tolerance:
+            raise ValueError(f"{day_type} demand probabilities must sum to 1.")
+
+
+def parse_table(text):
+    # One "demand, probability" pair per line; blank lines and # comments are skipped.
+    table = {}
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        try:
+            demand, prob = line.replace(",", " ").split()
+            table[int(demand)] = float(prob)
+        except ValueError:
+            raise ValueError(f"Line {number}: expected 'demand, probability', got {line!r}.") from None
+    return table
+
+
+def format_table(table):
+    return "\n".join(f"{demand}, {prob:g}" for demand, prob in sorted(table.items()))
+
+
+def load_distribution(file_path):
+    with open(file_path) as f:
+        day_type_probs, demand_dist = parse_distribution(json.load(f))
+    validate_distribution(day_type_probs, demand_dist)
+    return day_type_probs, demand_dist
+
+
+def save_distribution(file_path, day_type_probs, demand_dist):
+    data = {
+        "Day Type Probabilities": day_type_probs,
+        "Demand Distribution": {day_type: {str(d): prob for d, prob in sorted(table.items())} for day_type, table in demand_dist.items()}
+    }
+    with open(file_path, "w") as f:
+        json.dump(data, f, indent=4)
@@ -0,0 +1,90 @@
+import csv
+import json
+import os
+import time
+import zipfile
+import numpy as np
+from simulation import COLUMN_DTYPES, ResultStore, progress_report
+
+EXPORT_COLUMNS = ["Iteration", "Day", "Day Type", "Demand", "Revenue", "Excess Demand", "Lost Profit", "Scraps", "Salvage", "Daily Profit"]
+EXPORT_BLOCK_ROWS = 1 << 16
+PERIOD_FIELDS = ["Period", "Days", "Average Daily Profit", "Average Period Profit", "Share of Total Profit"]
+
+
+def block_rows(store, start, stop):
+    days = store.days
+    day_types = np.array(store.day_types)
+    return zip(
+        np.repeat(np.arange(start + 1, stop + 1), days).tolist(), np.tile(np.arange(1, days + 1), stop - start).tolist(),
+        day_types[store.columns["Day Type"][start:stop].ravel()].tolist(),
+        *(store.columns[name][start:stop].ravel().tolist() for name in EXPORT_COLUMNS[3:])
+    )
+
+
+def export_report(file_path, rows, started):
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(file_path)
+    return {
+        "Path": file_path, "Rows": rows, "Bytes": size, "Seconds": elapsed,
+        "Rows per Second": rows / elapsed if elapsed else float("inf"), "MB per Second": size / 2**20 / elapsed if elapsed else float("inf")
+    }
+
+
+def export_csv(file_path, store, progress=None, cancel=None):
+    # Writes one block of iterations at a time, so memory stays bounded by EXPORT_BLOCK_ROWS.
+    started = time.perf_counter()
+    block = max(1, EXPORT_BLOCK_ROWS // max(store.days, 1))
+    rows = 0
+    with open(file_path, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(EXPORT_COLUMNS)
+        for start in range(0, len(store), block):
+            stop = min(start + block, len(store))
+            writer.writerows(block_rows(store, start, stop))
+            rows += (stop - start) * store.days
+            if progress is not None:
+                progress(progress_report(stop, len(store), started))
+            if cancel is not None and cancel.is_set():
+                break
+    return export_report(file_path, rows, started)
+
+
+def write_npz_column(archive, name, column, days):
+    # np.savez would read the whole column first; this streams it into the archive one block of iterations at a time.
+    header = {"descr": np.lib.format.dtype_to_descr(np.dtype(column.dtype)), "fortran_order": False, "shape": tuple(column.shape)}
+    block = max(1, EXPORT_BLOCK_ROWS // max(days, 1))
+    with archive.open(name + ".npy", "w", force_zip64=True) as member:
+        np.lib.format.write_array_header_1_0(member, header)
+        for start in range(0, len(column), block):
+            member.write(np.ascontiguousarray(column[start:start + block]).tobytes())
+
+
+def save_npz(file, store, params=None, compress=False):
+    extra = {"Day Types": np.array(store.day_types), "Days": store.days, "Total Profit": store.total_profit}
+    if params is not None:
+        extra["Parameters"] = json.dumps(params)
+    with zipfile.ZipFile(file, "w", zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, column in store.columns.items():
+            write_npz_column(archive, name, column, store.days)
+        for name, value in extra.items():
+            with archive.open(name + ".npy", "w", force_zip64=True) as member:
+                np.lib.format.write_array(member, np.asanyarray(value))
+
+
+def load_npz(file):
+    with np.load(file) as data:
+        return ResultStore({name: data[name] for name in COLUMN_DTYPES}, data["Day Types"].tolist(), int(data["Days"]))
+
+
+def export_npz(file_path, store, params=None, compress=False):
+    started = time.perf_counter()
+    with open(file_path, "wb") as f:
+        save_npz(f, store, params, compress)
+    return export_report(file_path, len(store) * store.days, started)
+
+
+def export_periods(file_path, breakdown):
+    with open(file_path, "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=PERIOD_FIELDS)
+        writer.writeheader()
+        writer.writerows(breakdown)
@@ -0,0 +1,266 @@
+import argparse
+import csv
+from functools import partial
+import json
+import logging
+import os
+import time
+from contextlib import closing
+from statistics import NormalDist
+import numpy as np
+from distributions import AliasTable, DemandTables, cumulative_masses, load_distribution, parse_distribution, validate_distribution
+from export import export_periods
+from profiling import count, span
+from schedules import parse_schedule, period_breakdown, schedule_rows, validate_schedule
+from simulation import (CHUNK_SIZE, CONFIDENCE, DEFAULT_DEMAND_DIST, DEFAULT_PARAMETERS, cumulative_day_type_probs, cumulative_demand_dist,
+                        iteration_chunks, map_chunks, new_seed, progress_report, sequential_sum)
+from sketches import ProfitDistribution
+
+log = logging.getLogger("fleet")
+
+FLEET_BLOCK_CELLS = 1 << 20
+SELLER_FIELDS = ["Paper Sell Price", "Paper Cost", "Scrap Sale Price", "Quantity"]
+SELLER_SUMMARY_FIELDS = ["Seller", "Demand Profile"] + SELLER_FIELDS + [
+    "Average Daily Profit", "Confidence Half-Width", "Min Profit", "Max Profit", "Probability of Loss", "Fill Rate", "Average Daily Scraps"
+]
+
+
+def read_sellers(file_path):
+    with open(file_path, newline="") as f:
+        return [{key: value for key, value in row.items() if value not in (None, "")} for row in csv.DictReader(f)]
+
+
+def parse_fleet(data, base_dir="."):
+    # Fleet-wide settings use the scenario keys; each seller overrides prices and quantity and names a demand profile.
+    params = {key: data.get(key, DEFAULT_PARAMETERS[key]) for key in ("Days", "Iterations", "Seed", "Day Type Probabilities")}
+    params["Days"], params["Iterations"] = int(params["Days"]), int(params["Iterations"])
+    params["Seed"] = new_seed() if params["Seed"] is None else params["Seed"]
+    params["Shared Day Types"] = bool(data.get("Shared Day Types", False))
+    params["Day Type Probabilities"], _ = parse_distribution(data, params["Day Type Probabilities"])
+    params["Day Type Schedule"] = parse_schedule(data.get("Day Type Schedule"), params["Day Type Probabilities"])
+    validate_schedule(params["Day Type Schedule"], params["Day Type Probabilities"])
+    profiles = {"Default": DEFAULT_DEMAND_DIST}
+    for name, profile in data.get("Demand Profiles", {}).items():
+        if "Distribution File" in profile:
+            profiles[name] = load_distribution(os.path.join(base_dir, profile["Distribution File"]))[1]
+        else:
+            profiles[name] = parse_distribution({"Demand Distribution": profile})[1]
+    for name, demand_dist in profiles.items():
+        try:
+            validate_distribution(params["Day Type Probabilities"], demand_dist)
+        except ValueError as error:
+            raise ValueError(f"Demand profile {name}: {error}") from None
+    rows = read_sellers(os.path.join(base_dir, data["Sellers File"])) if "Sellers File" in data else data.get("Sellers", [])
+    if not rows:
+        raise ValueError("A fleet needs at least one seller.")
+    sellers = []
+    for number, row in enumerate(rows, 1):
+        seller = {"Seller": str(row.get("Seller", number)), "Demand Profile": row.get("Demand Profile", "Default")}
+        seller.update({field: float(row.get(field, DEFAULT_PARAMETERS[field])) for field in SELLER_FIELDS})
+        seller["Quantity"] = int(seller["Quantity"])
+        if seller["Demand Profile"] not in profiles:
+            raise ValueError(f"Seller {seller['Seller']}: unknown demand profile {seller['Demand Profile']!r}.")
+        if min(seller[field] for field in SELLER_FIELDS) < 0:
+            raise ValueError(f"Seller {seller['Seller']}: prices and quantity cannot be negative.")
+        sellers.append(seller)
+    return {"Parameters": params, "Demand Profiles": profiles, "Sellers": sellers}
+
+
+def load_fleet(file_path):
+    with open(file_path) as f:
+        return parse_fleet(json.load(f), os.path.dirname(file_path))
+
+
+class FleetTables:
+    # Every (demand profile, day type) pair is one row of a single alias table, so a block of sellers with
+    # different profiles is sampled in one call.
+    def __init__(self, fleet):
+        params = fleet["Parameters"]
+        self.day_types = sorted(params["Day Type Probabilities"])
+        rows, self.day_rows = [params["Day Type Probabilities"]], 0
+        if params["Day Type Schedule"]:
+            rows, self.day_rows = schedule_rows(params["Day Type Schedule"], self.day_types, params["Days"])
+        masses = []
+        for row in rows:
+            row_masses, rest = cumulative_masses(list(cumulative_day_type_probs(row).values()))
+            row_masses[-1] += rest
+            masses.append(row_masses)
+        self.day_type_alias = AliasTable(np.tile(np.arange(len(self.day_types)), (len(rows), 1)), masses)
+        profile_names = list(fleet["Demand Profiles"])
+        cum = {(profile, day_type): table for profile in profile_names
+               for day_type, table in cumulative_demand_dist(fleet["Demand Profiles"][profile]).items()}
+        self.demand = DemandTables(cum)
+        self.rows = self.demand.rows_for([(profile, day_type) for profile in profile_names for day_type in self.day_types])
+        self.rows = self.rows.reshape(len(profile_names), len(self.day_types))
+        self.profile_index = {profile: i for i, profile in enumerate(profile_names)}
+
+
+def seller_arrays(fleet, tables):
+    sellers = fleet["Sellers"]
+    return {
+        "p": np.array([seller["Paper Sell Price"] for seller in sellers]), "c": np.array([seller["Paper Cost"] for seller in sellers]),
+        "s": np.array([seller["Scrap Sale Price"] for seller in sellers]), "q": np.array([seller["Quantity"] for seller in sellers]),
+        "profile": np.array([tables.profile_index[seller["Demand Profile"]] for seller in sellers], dtype=np.intp)
+    }
+
+
+def fleet_blocks(sellers, iterations, days):
+    # Fixed block shapes and per-block streams keep results independent of the worker count.
+    seller_block = max(1, FLEET_BLOCK_CELLS // (CHUNK_SIZE * max(days, 1)))
+    return [(chunk, seller_index, first, min(first + seller_block, sellers), start, stop)
+            for chunk, start, stop in iteration_chunks(iterations)
+            for seller_index, first in enumerate(range(0, sellers, seller_block))]
+
+
+def fleet_block(params, tables, arrays, block):
+    chunk, seller_index, first, last, start, stop = block
+    days, iterations = params["Days"], stop - start
+    p, c, s, q = (arrays[name][first:last, None, None] for name in ("p", "c", "s", "q"))
+    with span("Random Draws"):
+        block_rng = np.random.default_rng(np.random.SeedSequence(params["Seed"], spawn_key=(1, chunk, seller_index)))
+        if params["Shared Day Types"]:
+            # One day-type stream per iteration chunk, read by every seller block, so all sellers see the same days.
+            day_rng = np.random.default_rng(np.random.SeedSequence(params["Seed"], spawn_key=(0, chunk)))
+            day_rnd = day_rng.random((1, iterations, days))
+        else:
+            day_rnd = block_rng.random((last - first, iterations, days))
+        demand_rnd = block_rng.random((last - first, iterations, days))
+    with span("Demand Lookup"):
+        codes = tables.day_type_alias.sample(day_rnd, tables.day_rows)
+        demand = tables.demand.alias.sample(demand_rnd, tables.rows[arrays["profile"][first:last, None, None], codes])
+    with span("Profit Arithmetic"):
+        sold = np.minimum(demand, q)
+        scraps = np.maximum(0, q - demand)
+        daily_profit = sold * p - (q * c) + scraps * s
+        totals = sequential_sum(daily_profit)
+    count("Seller Days", demand.size)
+    mean = totals.mean(axis=1)
+    return {
+        "Mean": mean, "M2": ((totals - mean[:, None]) ** 2).sum(axis=1), "Min": totals.min(axis=1), "Max": totals.max(axis=1),
+        "Losses": (totals < 0).sum(axis=1), "Sold": sold.sum(axis=(1, 2)), "Demand": demand.sum(axis=(1, 2)),
+        "Scraps": scraps.sum(axis=(1, 2)), "Fleet Totals": totals.sum(axis=0), "Fleet Days": daily_profit.sum(axis=(0, 1))
+    }
+
+
+class SellerStats:
+    # Per-seller running statistics over iteration totals, merged block by block (Chan et al.), one array per field.
+    def __init__(self, sellers):
+        self.count = np.zeros(sellers)
+        self.mean = np.zeros(sellers)
+        self.m2 = np.zeros(sellers)
+        self.min = np.full(sellers, np.inf)
+        self.max = np.full(sellers, -np.inf)
+        self.sums = {name: np.zeros(sellers) for name in ("Losses", "Sold", "Demand", "Scraps")}
+
+    def merge(self, first, last, part, n):
+        rows = slice(first, last)
+        count = self.count[rows] + n
+        delta = part["Mean"] - self.mean[rows]
+        self.m2[rows] += part["M2"] + delta ** 2 * self.count[rows] * n / count
+        self.mean[rows] += delta * n / count
+        self.count[rows] = count
+        self.min[rows] = np.minimum(self.min[rows], part["Min"])
+        self.max[rows] = np.maximum(self.max[rows], part["Max"])
+        for name, total in self.sums.items():
+            total[rows] += part[name]
+
+
+def profit_bounds(arrays, days):
+    # Sum of every seller's per-day extremes: selling nothing and selling the whole order.
+    low, high = arrays["q"] * (arrays["s"] - arrays["c"]), arrays["q"] * (arrays["p"] - arrays["c"])
+    return days * np.minimum(low, high).sum(), days * np.maximum(low, high).sum()
+
+
+def simulate_fleet(fleet, workers=1, progress=None, cancel=None):
+    params = fleet["Parameters"]
+    started = time.perf_counter()
+    tables = FleetTables(fleet)
+    arrays = seller_arrays(fleet, tables)
+    sellers, days = len(fleet["Sellers"]), params["Days"]
+    stats = SellerStats(sellers)
+    fleet_totals = np.zeros(params["Iterations"])
+    # Fleet profit per day of the horizon, summed over completed iterations; it feeds the per-period breakdown.
+    fleet_days, chunk_days = np.zeros(days), np.zeros(days)
+    distribution = ProfitDistribution(*profit_bounds(arrays, days))
+    blocks = fleet_blocks(sellers, params["Iterations"], days)
+    done, chunk_parts = 0, []
+    with closing(map_chunks(partial(fleet_block, params, tables, arrays), blocks, workers)) as results:
+        for (_, _, first, last, start, stop), part in results:
+            chunk_parts.append((first, last, part))
+            fleet_totals[start:stop] += part["Fleet Totals"]
+            chunk_days += part["Fleet Days"]
+            if last == sellers:
+                # Blocks arrive in order, so an iteration chunk is complete once its last sellers are in; only then do
+                # its blocks reach the per-seller statistics, which then cover the same iterations as the fleet totals.
+                for block_first, block_last, block_part in chunk_parts:
+                    stats.merge(block_first, block_last, block_part, stop - start)
+                chunk_parts.clear()
+                distribution.update(fleet_totals[start:stop])
+                fleet_days += chunk_days
+                chunk_days[:] = 0
+                done = stop
+            if progress is not None:
+                progress(progress_report(done, params["Iterations"], started))
+            if cancel is not None and cancel.is_set():
+                break
+    return fleet_results(fleet, stats, fleet_totals[:done], fleet_days / max(done, 1), distribution, time.perf_counter() - started)
+
+
+def fleet_results(fleet, stats, fleet_totals, day_means, distribution, elapsed):
+    days = fleet["Parameters"]["Days"]
+    z = NormalDist().inv_cdf(0.5 + CONFIDENCE / 2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        half_width = z * np.sqrt(stats.m2 / (stats.count - 1) / stats.count) / days
+        fill_rate = stats.sums["Sold"] / stats.sums["Demand"]
+    sellers = []
+    for i, seller in enumerate(fleet["Sellers"]):
+        sellers.append(dict(seller, **{
+            "Average Daily Profit": stats.mean[i] / days, "Confidence Half-Width": half_width[i],
+            "Min Profit": stats.min[i], "Max Profit": stats.max[i], "Probability of Loss": stats.sums["Losses"][i] / stats.count[i],
+            "Fill Rate": fill_rate[i], "Average Daily Scraps": stats.sums["Scraps"][i] / stats.count[i] / days
+        }))
+    # Only completed iterations count; a cancelled run reports what it finished.
+    seller_days = int(stats.count.sum()) * days
+    aggregate = {
+        "Sellers": len(sellers), "Iterations Used": len(fleet_totals), "Average Daily Profit": float(fleet_totals.mean() / days) if len(fleet_totals) else float("nan"),
+        "Confidence Half-Width": float(z * fleet_totals.std(ddof=1) / np.sqrt(len(fleet_totals)) / days) if len(fleet_totals) > 1 else float("nan"),
+        "Seller Days": seller_days, "Elapsed": elapsed, "Seller Days per Second": seller_days / elapsed if elapsed else float("inf")
+    }
+    aggregate.update(distribution.summary())
+    results = {"Parameters": fleet["Parameters"], "Sellers": sellers, "Fleet": aggregate, "Profit Distribution": distribution}
+    if fleet["Parameters"]["Day Type Schedule"]:
+        results["Period Breakdown"] = period_breakdown(fleet["Parameters"]["Day Type Schedule"], day_means)
+    return results
+
+
+def export_sellers(file_path, result):
+    with open(file_path, "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=SELLER_SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows({field: seller[field] for field in SELLER_SUMMARY_FIELDS} for seller in result["Sellers"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a fleet of newspaper sellers in one batched run.")
+    parser.add_argument("fleet", help="fleet JSON file")
+    parser.add_argument("-o", "--output", default="sellers.csv", help="per-seller summary CSV")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="worker processes for seller blocks")
+    parser.add_argument("--periods", metavar="CSV", help="also write the fleet's profit per schedule period")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    result = simulate_fleet(load_fleet(args.fleet), args.workers)
+    export_sellers(args.output, result)
+    aggregate = result["Fleet"]
+    log.info("%d sellers: fleet daily profit $%.2f ± %.2f, P5/P50/P95 total $%.2f/$%.2f/$%.2f, P(loss) %.2f%%",
+             aggregate["Sellers"], aggregate["Average Daily Profit"], aggregate["Confidence Half-Width"],
+             aggregate["P5"], aggregate["P50"], aggregate["P95"], 100 * aggregate["Probability of Loss"])
+    for row in result.get("Period Breakdown", []):
+        log.info("%s: %d days, fleet daily profit $%.2f, %.1f%% of total", row["Period"], row["Days"], row["Average Daily Profit"],
+                 100 * row["Share of Total Profit"])
+    if args.periods and "Period Breakdown" in result:
+        export_periods(args.periods, result["Period Breakdown"])
+    log.info("%s seller-days in %.2fs (%.3g seller-days/s)", f"{aggregate['Seller Days']:,}", aggregate["Elapsed"], aggregate["Seller Days per Second"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import importlib.util
+from types import SimpleNamespace
+import numpy as np
+
+JIT_AVAILABLE = importlib.util.find_spec("numba") is not None
+# Importing numba and loading the cached loops costs about 0.7s per process for a 20-25% faster kernel, so the JIT
+# only pays off on runs that take NumPy a few seconds. The pure-Python reference never wins (2.8ms against 0.8ms
+# for 30 days x 10 iterations), so Auto leaves it to conformance checks and explicit overrides.
+JIT_MIN_CELLS = 20_000_000
+
+
+class NumpyKernel:
+    name = "NumPy"
+
+    def lookup(self, tables, day_rnd, demand_rnd):
+        day_type = tables.day_type_codes(day_rnd)
+        return day_type, tables.demands(day_type, demand_rnd)
+
+    def arithmetic(self, demand, quantity, p, c, s):
+        revenue = np.minimum(demand, quantity) * p
+        excess_demand = np.maximum(0, demand - quantity)
+        lost_profit = excess_demand * (p - c)
+        scraps = np.maximum(0, quantity - demand)
+        salvage = scraps * s
+        daily_profit = revenue - (quantity * c) + salvage
+        return revenue, excess_demand, lost_profit, scraps, salvage, daily_profit
+
+
+class PythonKernel:
+    # The reference: the original per-day loop with plain floats, in the same operation order as the NumPy kernel.
+    name = "Python"
+
+    def lookup(self, tables, day_rnd, demand_rnd):
+        day_rows = tables.day_rows_for(day_rnd.shape[-1]).tolist()
+        day_tables = [list(enumerate(tables.day_type_cum[row].tolist())) for row in day_rows]
+        demand_tables = [list(zip(values.tolist(), cum.tolist())) for values, cum in zip(tables.demand_values, tables.demand_cum)]
+        last = len(tables.day_types) - 1
+        codes = [[self.first_above(table, u, last) for table, u in zip(day_tables, row)] for row in day_rnd.tolist()]
+        demand = []
+        for code_row, rnd_row in zip(codes, demand_rnd.tolist()):
+            demand.append([self.first_above(demand_tables[code], u, 0) for code, u in zip(code_row, rnd_row)])
+        return np.array(codes), np.array(demand)
+
+    @staticmethod
+    def first_above(table, u, fallback):
+        for value, cum_prob in table:
+            if u < cum_prob:
+                return value
+        return fallback
+
+    def arithmetic(self, demand, quantity, p, c, s):
+        columns = [[] for _ in range(6)]
+        for row in demand.tolist():
+            for column, values in zip(columns, zip(*(self.day(d, quantity, p, c, s) for d in row))):
+                column.append(values)
+        return tuple(np.array(column).reshape(demand.shape) for column in columns)
+
+    @staticmethod
+    def day(d, quantity, p, c, s):
+        revenue = min(d, quantity) * p
+        excess_demand = max(0, d - quantity)
+        scraps = max(0, quantity - d)
+        salvage = scraps * s
+        return revenue, excess_demand, excess_demand * (p - c), scraps, salvage, revenue - (quantity * c) + salvage
+
+
+def compile_jit():
+    # numba is imported on the first JIT run only, so every other run and the app's startup skip its import cost.
+    import numba
+
+    @numba.njit(cache=True)
+    def jit_day_type_codes(rnd, cum, day_rows):
+        out = np.empty(rnd.shape, dtype=np.int64)
+        for i in range(rnd.shape[0]):
+            for j in range(rnd.shape[1]):
+                out[i, j] = min(np.searchsorted(cum[day_rows[j]], rnd[i, j], side="right"), cum.shape[1] - 1)
+        return out
+
+    @numba.njit(cache=True)
+    def jit_inverse_cdf(rnd, codes, values, cum, lengths):
+        out = np.zeros(rnd.shape, dtype=np.int64)
+        for i in range(rnd.shape[0]):
+            for j in range(rnd.shape[1]):
+                code = codes[i, j]
+                n = lengths[code]
+                index = np.searchsorted(cum[code, :n], rnd[i, j], side="right")
+                if index < n:
+                    out[i, j] = values[code, index]
+        return out
+
+    @numba.njit(cache=True)
+    def jit_arithmetic(demand, quantity, p, c, s):
+        revenue = np.empty(demand.shape)
+        excess_demand = np.empty(demand.shape, dtype=np.int64)
+        lost_profit = np.empty(demand.shape)
+        scraps = np.empty(demand.shape, dtype=np.int64)
+        salvage = np.empty(demand.shape)
+        daily_profit = np.empty(demand.shape)
+        for i in range(demand.shape[0]):
+            for j in range(demand.shape[1]):
+                d = demand[i, j]
+                revenue[i, j] = min(d, quantity) * p
+                excess_demand[i, j] = max(0, d - quantity)
+                lost_profit[i, j] = excess_demand[i, j] * (p - c)
+                scraps[i, j] = max(0, quantity - d)
+                salvage[i, j] = scraps[i, j] * s
+                daily_profit[i, j] = revenue[i, j] - (quantity * c) + salvage[i, j]
+        return revenue, excess_demand, lost_profit, scraps, salvage, daily_profit
+
+    return SimpleNamespace(day_type_codes=jit_day_type_codes, inverse_cdf=jit_inverse_cdf, arithmetic=jit_arithmetic)
+
+
+class NumbaKernel:
+    # Compiled loops with the reference's operation order and no fast-math, so results match bit for bit.
+    name = "Numba"
+
+    def __init__(self):
+        self.jit = None
+
+    def lookup(self, tables, day_rnd, demand_rnd):
+        self.jit = self.jit or compile_jit()
+        day_rows = tables.day_rows_for(day_rnd.shape[-1])
+        codes = self.jit.day_type_codes(day_rnd, tables.day_type_cum, day_rows)
+        width = max((len(values) for values in tables.demand_values), default=0)
+        values = np.zeros((len(tables.demand_values), max(width, 1)), dtype=np.int64)
+        cum = np.ones(values.shape)
+        for row, (row_values, row_cum) in enumerate(zip(tables.demand_values, tables.demand_cum)):
+            values[row, :len(row_values)], cum[row, :len(row_cum)] = row_values, row_cum
+        lengths = np.array([len(values) for values in tables.demand_values], dtype=np.int64)
+        return codes, self.jit.inverse_cdf(demand_rnd, codes, values, cum, lengths)
+
+    def arithmetic(self, demand, quantity, p, c, s):
+        self.jit = self.jit or compile_jit()
+        return self.jit.arithmetic(np.ascontiguousarray(demand, dtype=np.int64), int(quantity), float(p), float(c), float(s))
+
+
+KERNELS = {kernel.name: kernel for kernel in [PythonKernel(), NumpyKernel()] + ([NumbaKernel()] if JIT_AVAILABLE else [])}
+BACKENDS = ["Auto"] + list(KERNELS)
+
+
+def choose_backend(days, iterations, backend="Auto"):
+    if backend != "Auto":
+        if backend not in KERNELS:
+            raise ValueError(f"The {backend} backend is not available; choose one of {', '.join(BACKENDS)}.")
+        return backend
+    return "Numba" if JIT_AVAILABLE and days * iterations >= JIT_MIN_CELLS else "NumPy"
+
+
+def check_conformance(iterations=64, days=30, seed=2024, backends=None):
+    # Every backend gets the same random inputs for every sampling mode, the awkward tables (a day type with no
+    # demand table, a table whose probabilities stop short of one) and a weekly schedule; any column that differs is
+    # reported.
+    from distributions import DemandTables
+    from schedules import parse_schedule
+    from simulation import (DEFAULT_DEMAND_DIST, DEFAULT_PARAMETERS, SAMPLING_MODES, chunk_rng, cumulative_demand_dist, draw_randoms,
+                            lookup_tables, simulate_days)
+    awkward = {"Good": DEFAULT_DEMAND_DIST["Good"], "Fair": {40: 0.5, 70: 0.3}}
+    weekend = {"Good": 0.6, "Fair": 0.4}
+    cases = {
+        "Default": ({"Good": 0.35, "Fair": 0.45, "Poor": 0.20}, DEFAULT_DEMAND_DIST, None),
+        "Awkward": ({"Good": 0.3, "Fair": 0.3, "Poor": 0.3}, awkward, None),
+        "Scheduled": ({"Good": 0.35, "Fair": 0.45, "Poor": 0.20}, DEFAULT_DEMAND_DIST, {"Weekdays": {"Saturday": weekend, "Sunday": weekend}})
+    }
+    mismatches = []
+    for (case, (day_type_probs, demand_dist, schedule)), sampling in ((case, sampling) for case in cases.items() for sampling in SAMPLING_MODES):
+        params = dict(DEFAULT_PARAMETERS, Days=days, Sampling=sampling, **{
+            "Day Type Probabilities": day_type_probs, "Day Type Schedule": parse_schedule(schedule, day_type_probs)
+        })
+        tables = lookup_tables(params, DemandTables(cumulative_demand_dist(demand_dist)))
+        day_rnd, demand_rnd = draw_randoms(chunk_rng(seed, 0), iterations, days, sampling)
+        results = {name: simulate_days(day_rnd, demand_rnd, 70, 0.5, 0.33, 0.05, tables, name) for name in ["Python"] + (backends or list(KERNELS))}
+        for name, columns in results.items():
+            for column, values in columns.items():
+                reference = results["Python"][column]
+                if values.dtype != reference.dtype or not np.array_equal(values, reference):
+                    mismatches.append(f"{case}/{sampling}: {name} differs from Python in {column}")
+    return mismatches
+
+
+def main():
+    mismatches = check_conformance()
+    for mismatch in mismatches:
+        print(mismatch)
+    print(f"{', '.join(KERNELS)}: " + ("identical on every case." if not mismatches else f"{len(mismatches)} mismatches."))
+    raise SystemExit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,58 @@
+from startup import StartupTimer
+
+STARTUP = StartupTimer()
+
+import copy
+import json
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import numpy as np
+import profiling
+from profiling import span
+from cache import DEFAULT_CACHE_DIR, ResultCache, cache_key
+from export import export_csv, export_npz, export_periods
+from kernels import BACKENDS
+from analytic import expected_outcomes, optimal_quantity, validate_monte_carlo
+from optimizer import optimize_quantity
+from sensitivity import export_grid, sensitivity_grid, sensitivity_parameters
+from schedules import load_schedule, validate_schedule
+from service import ServiceClient
+from distributions import (DemandTables, format_table, load_distribution, parse_table, save_distribution, validate_demand_tables,
+                           validate_distribution)
+from simulation import DEFAULT_DEMAND_DIST, DEFAULT_PARAMETERS, SAMPLING_MODES, build_results, cumulative_demand_dist, new_seed, simulate, sweep_quantities
+
+STARTUP.mark("Engine Imports")
+
+# Plotting, PIL and CTkMessagebox are imported where they are first needed; only the toolkit loads up front.
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import ttk
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-import numpy as np
-import random
-import os
-from PIL import Image
-from CTkMessagebox import CTkMessagebox
-import threading
+from widgets import VirtualTable
+
+STARTUP.mark("Toolkit Imports")
+
+RUN_STORE_DIR = os.path.join(DEFAULT_CACHE_DIR, "runs")
+MAX_ITERATION_CHOICES = 1000
 
 ctk.set_appearance_mode("System")
 ctk.set_default_color_theme("blue")
 
+def message_box(**kwargs):
+    from CTkMessagebox import CTkMessagebox
+    return CTkMessagebox(**kwargs)
+
 def change_appearance_mode(new_appearance_mode):
     ctk.set_appearance_mode(new_appearance_mode)
 
 class App(ctk.CTk):
-    def __init__(self):
+    def __init__(self, startup_report=False):
         super().__init__()
-        self.demand_dist = {
-            "Good": {40: 0.03, 50: 0.05, 60: 0.15, 70: 0.20, 80: 0.35, 90: 0.15, 100: 0.07},
-            "Fair": {40: 0.10, 50: 0.18, 60: 0.40, 70: 0.20, 80: 0.08, 90: 0.04, 100: 0.00},
-            "Poor": {40: 0.44, 50: 0.22, 60: 0.16, 70: 0.12, 80: 0.06, 90: 0.00, 100: 0.00}
-        }
+        self.startup_report = startup_report
+        self.demand_dist = copy.deepcopy(DEFAULT_DEMAND_DIST)
         self.title("Newspaper Seller Simulation Dashboard")
         self.geometry(f"{1200}x{800}")
         self.minsize(1000, 600)
@@ -45,19 +74,53 @@ class App(ctk.CTk):
         self.simulation_status = tk.StringVar(value="Ready")
         status_label = ctk.CTkLabel(self.status_bar, textvariable=self.simulation_status, anchor="w")
         status_label.pack(side="left", padx=10, fill="x", expand=True)
-        self.progress_bar = ctk.CTkProgressBar(self.status_bar, mode='indeterminate')
+        self.result_cache = ResultCache()
+        self.cache_status = tk.StringVar(value=self.result_cache.status())
+        cache_label = ctk.CTkLabel(self.status_bar, textvariable=self.cache_status, anchor="e")
+        cache_label.pack(side="left", padx=10)
+        self.cancel_button = ctk.CTkButton(self.status_bar, text="Cancel", width=70, state="disabled", command=self.cancel_run)
+        self.cancel_button.pack(side="right", padx=(0, 10))
+        self.progress_bar = ctk.CTkProgressBar(self.status_bar, mode='determinate')
         self.progress_bar.set(0)
         self.progress_bar.pack(side="right", padx=10)
+        self.messages = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.worker_busy = False
         self.initialize_variables()
         self.create_sidebar()
         self.create_main_content()
-        self.setting_image = ctk.CTkImage(Image.open(os.path.join(self.path, "setting-icon.png")), size=(26, 26))
-        self.theme_icon_label = ctk.CTkLabel(self.settings_frame, image=self.setting_image, text="", width=26, height=26, fg_color="transparent")
+        self.theme_icon_label = ctk.CTkLabel(self.settings_frame, text="", width=26, height=26, fg_color="transparent")
         self.theme_icon_label.bind("<Button-1>", lambda e: self.open_settings_window())
         self.theme_icon_label.grid(row=0, column=0, padx=(0, 20), pady=10, sticky="e")
         self.run_button = ctk.CTkButton(self.settings_frame, text=">> Run Simulation", command=self.run_simulation,
                                         fg_color="#28a745", hover_color="#218838", font=ctk.CTkFont(weight="bold"))
         self.run_button.grid(row=0, column=1, padx=(20, 0), pady=10, sticky="w")
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        STARTUP.mark("Window")
+        self.after_idle(self.on_first_idle)
+
+    def on_first_idle(self):
+        STARTUP.mark("First Idle")
+        if self.startup_report:
+            print(json.dumps(STARTUP.report(), indent=4))
+            self.destroy()
+            return
+        self.simulation_status.set(f"Ready | {STARTUP.format()}")
+        # The settings icon is the only image at startup, so PIL loads once the window is up.
+        with STARTUP.defer("Settings Icon"):
+            from PIL import Image
+            self.setting_image = ctk.CTkImage(Image.open(os.path.join(self.path, "setting-icon.png")), size=(26, 26))
+            self.theme_icon_label.configure(image=self.setting_image)
+
+    def on_close(self):
+        self.remove_run_directory()
+        self.destroy()
+
+    def remove_run_directory(self, keep=None):
+        # Disk-backed runs are scratch space: only the run on screen keeps its files.
+        directory = self.simulation_results["Iterations"].directory if self.simulation_results else None
+        if directory and directory != keep:
+            shutil.rmtree(directory, ignore_errors=True)
 
     def open_settings_window(self):
         settings_window = ctk.CTkToplevel(self)
@@ -81,9 +144,19 @@ class App(ctk.CTk):
         self.days = ctk.IntVar(value=30)
         self.quantity = ctk.IntVar(value=70)
         self.iterations = ctk.IntVar(value=100)
-        self.good_prob = ctk.DoubleVar(value=0.35)
-        self.fair_prob = ctk.DoubleVar(value=0.45)
-        self.poor_prob = ctk.DoubleVar(value=0.20)
+        self.default_day_type_probs = dict(DEFAULT_PARAMETERS["Day Type Probabilities"])
+        self.set_day_types(self.default_day_type_probs)
+        self.seed = tk.StringVar(value="")
+        self.workers = ctk.IntVar(value=os.cpu_count() or 1)
+        self.validate_exact = tk.BooleanVar(value=False)
+        self.record_trace = tk.BooleanVar(value=False)
+        self.target_half_width = tk.StringVar(value="")
+        self.sampling = tk.StringVar(value="Plain")
+        self.store_on_disk = tk.BooleanVar(value=False)
+        self.service_url = tk.StringVar(value="")
+        self.backend = tk.StringVar(value="Auto")
+        self.day_type_schedule = None
+        self.schedule_status = tk.StringVar(value="Same probabilities every day")
         self.simulation_results = None
         self.simulation_status = tk.StringVar(value="Ready")
 
@@ -93,9 +166,14 @@ class App(ctk.CTk):
         self.days.trace_add("write", lambda *args: self.validate_positive(self.days, "Number of Days"))
         self.quantity.trace_add("write", lambda *args: self.validate_positive(self.quantity, "Paper Quantity"))
         self.iterations.trace_add("write", lambda *args: self.validate_positive(self.iterations, "Number of Iterations"))
-        self.good_prob.trace_add("write", lambda *args: self.validate_prob(self.good_prob, "Good Day Probability"))
-        self.fair_prob.trace_add("write", lambda *args: self.validate_prob(self.fair_prob, "Fair Day Probability"))
-        self.poor_prob.trace_add("write", lambda *args: self.validate_prob(self.poor_prob, "Poor Day Probability"))
+        self.workers.trace_add("write", lambda *args: self.validate_positive(self.workers, "Worker Processes"))
+
+    def set_day_types(self, day_type_probs):
+        self.day_type_probs = {}
+        for day_type, prob in day_type_probs.items():
+            var = ctk.DoubleVar(value=prob)
+            var.trace_add("write", lambda *args, v=var, n=f"{day_type} Day Probability": self.validate_prob(v, n))
+            self.day_type_probs[day_type] = var
 
     def validate_positive(self, var, name):
         try:
@@ -103,10 +181,10 @@ class App(ctk.CTk):
             if value == "":
                 return
             if float(value) < 0:
-                CTkMessagebox(title="Invalid Value", message=f"{name} cannot be negative.", icon="warning")
+                message_box(title="Invalid Value", message=f"{name} cannot be negative.", icon="warning")
                 var.set(0)
         except ValueError:
-            CTkMessagebox(title="Invalid Input", message=f"{name} must be a number.", icon="warning")
+            message_box(title="Invalid Input", message=f"{name} must be a number.", icon="warning")
             var.set(0)
 
     def validate_prob(self, var, name):
@@ -116,10 +194,10 @@ class App(ctk.CTk):
                 return
             value = float(value)
             if value < 0 or value > 1:
-                CTkMessagebox(title="Invalid Probability", message=f"{name} must be between 0 and 1.", icon="warning")
+                message_box(title="Invalid Probability", message=f"{name} must be between 0 and 1.", icon="warning")
                 var.set(0)
         except ValueError:
-            CTkMessagebox(title="Invalid Input", message=f"{name} must be a number.", icon="warning")
+            message_box(title="Invalid Input", message=f"{name} must be a number.", icon="warning")
             var.set(0)
 
     def reset(self):
@@ -129,13 +207,19 @@ class App(ctk.CTk):
         self.days.set(30)
         self.quantity.set(70)
         self.iterations.set(100)
-        self.good_prob.set(0.35)
-        self.fair_prob.set(0.45)
-        self.poor_prob.set(0.20)
+        for day_type, var in self.day_type_probs.items():
+            var.set(self.default_day_type_probs.get(day_type, 0.0))
+        self.seed.set("")
+        self.target_half_width.set("")
+        self.sampling.set("Plain")
+        self.store_on_disk.set(False)
+        self.backend.set("Auto")
+        self.set_schedule(None)
+        self.workers.set(os.cpu_count() or 1)
         self.simulation_status.set("Parameters reset to defaults")
 
     def create_main_content(self):
-        self.tabview = ctk.CTkTabview(self.content_frame)
+        self.tabview = ctk.CTkTabview(self.content_frame, command=self.on_tab_change)
         self.tabview.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
         self.tab_results = self.tabview.add("Simulation")
         self.tab_viz = self.tabview.add("Visualizations")
@@ -146,7 +230,7 @@ class App(ctk.CTk):
         self.content_frame.grid_rowconfigure(0, weight=1)
         self.content_frame.grid_columnconfigure(0, weight=1)
         self.setup_results_tab()
-        self.setup_visualization_tab()
+        self.viz_notebook = None
 
     def display_simulation_results(self):
         if not self.simulation_results: return
@@ -158,21 +242,39 @@ class App(ctk.CTk):
         self.summary_labels["Total Iterations"].configure(text=str(params["Iterations"]))
         self.summary_labels["Min Profit"].configure(text=f"${summary['Min Profit']:.2f}")
         self.summary_labels["Max Profit"].configure(text=f"${summary['Max Profit']:.2f}")
+        self.summary_labels["Precision (95% CI)"].configure(text=f"±${summary['Confidence Half-Width']:.4f}")
+        self.summary_labels["Iterations Used"].configure(text=str(summary["Iterations Used"]))
+        self.summary_labels["Variance Reduction"].configure(text=f"{summary['Variance Reduction']:.2f}x ({params['Sampling']})")
+        self.summary_labels["P5 / P50 / P95"].configure(text=f"${summary['P5']:.2f} / ${summary['P50']:.2f} / ${summary['P95']:.2f}")
+        self.summary_labels["Value at Risk (95%)"].configure(text=f"${summary['Value at Risk (95%)']:.2f}")
+        self.summary_labels["Probability of Loss"].configure(text=f"{summary['Probability of Loss']:.2%}")
+        self.update_profit_distribution()
+        exact = expected_outcomes(params, self.cum_demand_dist, [params["Quantity"]])
+        self.summary_labels["Exact Daily Profit"].configure(text=f"${exact['Expected Profit'][0]:.2f}")
+        self.summary_labels["Optimal Quantity"].configure(text=str(optimal_quantity(params, self.cum_demand_dist)))
+        if self.validate_exact.get():
+            validation = validate_monte_carlo(params, self.cum_demand_dist, self.simulation_results["Iterations"])
+            self.summary_labels["Monte Carlo Error"].configure(text=f"${validation['Error']:+.4f} ({validation['Standard Errors']:+.2f} SE)")
+        else:
+            self.summary_labels["Monte Carlo Error"].configure(text="--")
 
     def setup_results_tab(self):
         summary_frame = ctk.CTkFrame(self.tab_results)
         summary_frame.pack(fill="x", padx=10, pady=10)
         self.summary_labels = {}
-        summary_titles = ["Average Daily Profit", "Order Quantity", "Total Days Simulated", "Total Iterations", "Min Profit", "Max Profit"]
+        summary_titles = ["Average Daily Profit", "Order Quantity", "Total Days Simulated", "Total Iterations",
+                          "Min Profit", "Max Profit", "Precision (95% CI)", "Iterations Used",
+                          "Exact Daily Profit", "Optimal Quantity", "Monte Carlo Error", "Variance Reduction",
+                          "P5 / P50 / P95", "Value at Risk (95%)", "Probability of Loss"]
         for i, title in enumerate(summary_titles):
-            row, col = divmod(i, 3)
+            row, col = divmod(i, 4)
             label_frame = ctk.CTkFrame(summary_frame)
             label_frame.grid(row=row, column=col, padx=10, pady=10, sticky="ew")
             ctk.CTkLabel(label_frame, text=title, font=ctk.CTkFont(size=12)).pack(pady=(5, 0))
             value_label = ctk.CTkLabel(label_frame, text="--", font=ctk.CTkFont(size=14, weight="bold"))
             value_label.pack(pady=(0, 5))
             self.summary_labels[title] = value_label
-        for i in range(3):
+        for i in range(4):
             summary_frame.grid_columnconfigure(i, weight=1)
         table_frame = ctk.CTkFrame(self.tab_results)
         table_frame.pack(fill="both", expand=True, padx=10, pady=10)
@@ -180,16 +282,9 @@ class App(ctk.CTk):
         tree_container = ttk.Frame(table_frame)
         tree_container.pack(fill="both", expand=True, padx=5, pady=5)
         columns = ("Day", "Day Type", "Demand", "Revenue", "Excess Demand", "Lost Profit", "Scraps", "Salvage", "Daily Profit")
-        self.results_tree = ttk.Treeview(tree_container, columns=columns, show="headings", height=15)
-        for col in columns:
-            self.results_tree.heading(col, text=col)
-            self.results_tree.column(col, width=100, anchor="center")
-        y_scrollbar = ttk.Scrollbar(tree_container, orient="vertical", command=self.results_tree.yview)
-        x_scrollbar = ttk.Scrollbar(tree_container, orient="horizontal", command=self.results_tree.xview)
-        self.results_tree.configure(yscrollcommand=y_scrollbar.set, xscrollcommand=x_scrollbar.set)
-        self.results_tree.grid(row=0, column=0, sticky="nsew")
-        y_scrollbar.grid(row=0, column=1, sticky="ns")
-        x_scrollbar.grid(row=1, column=0, sticky="ew")
+        self.results_table = VirtualTable(tree_container, columns, height=15)
+        self.results_tree = self.results_table.tree
+        self.results_table.grid(row=0, column=0)
         tree_container.grid_rowconfigure(0, weight=1)
         tree_container.grid_columnconfigure(0, weight=1)
         control_frame = ctk.CTkFrame(self.tab_results)
@@ -198,38 +293,75 @@ class App(ctk.CTk):
         self.iteration_var = tk.StringVar(value="1")
         self.iteration_combobox = ctk.CTkComboBox(control_frame, variable=self.iteration_var, values=["1"], command=self.update_results_display)
         self.iteration_combobox.pack(side="left", padx=5)
+        # Long runs only list the first iterations; any other one can be typed in.
+        self.iteration_combobox.bind("<Return>", lambda event: self.update_results_display(self.iteration_var.get()))
         export_button = ctk.CTkButton(control_frame, text="Export to CSV", command=self.export_results_to_csv)
         export_button.pack(side="right", padx=10)
+        export_all_button = ctk.CTkButton(control_frame, text="Export All Iterations", command=self.export_all_iterations)
+        export_all_button.pack(side="right", padx=10)
+        periods_button = ctk.CTkButton(control_frame, text="Profit by Period", command=self.open_period_breakdown)
+        periods_button.pack(side="right", padx=10)
 
     def export_results_to_csv(self):
         if not self.simulation_results:
-            CTkMessagebox(title="No Data", message="No simulation data to export.", icon="warning")
+            message_box(title="No Data", message="No simulation data to export.", icon="warning")
             return
         iteration_idx = int(self.iteration_var.get()) - 1
-        days_data = self.simulation_results["Iterations"][iteration_idx]["Days"]
+        store = self.simulation_results["Iterations"]
         import csv
         from tkinter import filedialog
         file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
         if file_path:
             with open(file_path, 'w', newline='') as csvfile:
-                fieldnames = ["Day", "Day Type", "Demand", "Revenue", "Excess Demand", "Lost Profit", "Scraps", "Salvage", "Daily Profit"]
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                for day_data in days_data:
-                    writer.writerow({
-                        "Day": day_data["Day"],
-                        "Day Type": day_data["Day Type"],
-                        "Demand": day_data["Demand"],
-                        "Revenue": f"{day_data['Revenue']:.2f}",
-                        "Excess Demand": day_data["Excess Demand"],
-                        "Lost Profit": f"{day_data['Lost Profit']:.2f}",
-                        "Scraps": day_data["Scraps"],
-                        "Salvage": f"{day_data['Salvage']:.2f}",
-                        "Daily Profit": f"{day_data['Daily Profit']:.2f}"
-                    })
-            CTkMessagebox(title="Export Successful", message=f"Data exported to {file_path}", icon="info")
+                writer = csv.writer(csvfile)
+                writer.writerow(["Day", "Day Type", "Demand", "Revenue", "Excess Demand", "Lost Profit", "Scraps", "Salvage", "Daily Profit"])
+                for day, day_type, demand, revenue, excess, lost, scraps, salvage, profit in store.rows(iteration_idx):
+                    writer.writerow([day, day_type, demand, f"{revenue:.2f}", excess, f"{lost:.2f}", scraps, f"{salvage:.2f}", f"{profit:.2f}"])
+            message_box(title="Export Successful", message=f"Data exported to {file_path}", icon="info")
+
+    def export_all_iterations(self):
+        if self.worker_running():
+            return
+        if not self.simulation_results:
+            message_box(title="No Data", message="No simulation data to export.", icon="warning")
+            return
+        from tkinter import filedialog
+        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv"), ("NumPy archive", "*.npz")])
+        if not file_path:
+            return
+        store = self.simulation_results["Iterations"]
+        params = self.simulation_results["Parameters"]
+        def export_thread(progress, cancel):
+            if file_path.endswith(".npz"):
+                return "export", export_npz(file_path, store, params)
+            return "export", export_csv(file_path, store, progress, cancel)
+        self.start_worker(export_thread, "Exporting all iterations...")
+
+    def on_export_complete(self, report):
+        state = "cancelled" if self.cancel_event.is_set() else "complete"
+        message = (f"Export {state}: {report['Rows']:,} rows, {report['Bytes'] / 2**20:.1f} MB in {report['Seconds']:.2f}s "
+                   f"({report['Rows per Second']:,.0f} rows/s, {report['MB per Second']:.1f} MB/s)")
+        self.simulation_status.set(message)
+        message_box(title="Export Finished", message=f"{message}\n{report['Path']}", icon="info")
+
+    def on_tab_change(self):
+        if self.tabview.get() == "Visualizations":
+            self.ensure_visualizations()
+
+    def ensure_visualizations(self):
+        # The figures are built on the first visit to the tab (or the first result sent there), then kept.
+        if self.viz_notebook is not None:
+            return
+        with STARTUP.defer("Visualizations Tab"):
+            self.setup_visualization_tab()
+            if self.simulation_results:
+                self.update_profit_distribution()
+                self.update_visualizations()
 
     def setup_visualization_tab(self):
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+        from charts import DailyProfitChart, DemandChart, ProfitDistributionChart
         self.viz_notebook = ttk.Notebook(self.tab_viz)
         self.viz_notebook.pack(fill="both", expand=True, padx=10, pady=10)
         daily_profit_frame = ttk.Frame(self.viz_notebook)
@@ -238,6 +370,7 @@ class App(ctk.CTk):
         self.daily_profit_canvas = FigureCanvasTkAgg(self.daily_profit_fig, daily_profit_frame)
         self.daily_profit_canvas.get_tk_widget().pack(fill="both", expand=True)
         NavigationToolbar2Tk(self.daily_profit_canvas, daily_profit_frame)
+        self.daily_profit_chart = DailyProfitChart(self.daily_profit_ax, self.daily_profit_canvas)
         # save_button1 = ctk.CTkButton(daily_profit_frame, text="Save Chart", command=lambda: self.save_figure(self.daily_profit_fig))
         # save_button1.pack(pady=5)
         demand_dist_frame = ttk.Frame(self.viz_notebook)
@@ -246,24 +379,39 @@ class App(ctk.CTk):
         self.demand_dist_canvas = FigureCanvasTkAgg(self.demand_dist_fig, demand_dist_frame)
         self.demand_dist_canvas.get_tk_widget().pack(fill="both", expand=True)
         NavigationToolbar2Tk(self.demand_dist_canvas, demand_dist_frame)
+        self.demand_chart = DemandChart(self.demand_dist_ax, self.demand_dist_canvas)
         # save_button2 = ctk.CTkButton(demand_dist_frame, text="Save Chart", command=lambda: self.save_figure(self.demand_dist_fig))
         # save_button2.pack(pady=5)
-        # New tab for Profit vs. Quantity
-        # profit_quantity_frame = ttk.Frame(self.viz_notebook)
-        # self.viz_notebook.add(profit_quantity_frame, text="Profit vs. Quantity")
-        # self.profit_quantity_fig, self.profit_quantity_ax = plt.subplots(figsize=(10, 6))
-        # self.profit_quantity_canvas = FigureCanvasTkAgg(self.profit_quantity_fig, profit_quantity_frame)
-        # self.profit_quantity_canvas.get_tk_widget().pack(fill="both", expand=True)
-        # NavigationToolbar2Tk(self.profit_quantity_canvas, profit_quantity_frame)
+        profit_quantity_frame = ttk.Frame(self.viz_notebook)
+        self.viz_notebook.add(profit_quantity_frame, text="Profit vs. Quantity")
+        self.profit_quantity_fig, self.profit_quantity_ax = plt.subplots(figsize=(10, 6))
+        self.profit_quantity_canvas = FigureCanvasTkAgg(self.profit_quantity_fig, profit_quantity_frame)
+        self.profit_quantity_canvas.get_tk_widget().pack(fill="both", expand=True)
+        NavigationToolbar2Tk(self.profit_quantity_canvas, profit_quantity_frame)
         # save_button3 = ctk.CTkButton(profit_quantity_frame, text="Save Chart", command=lambda: self.save_figure(self.profit_quantity_fig))
         # save_button3.pack(pady=5)
+        sensitivity_frame = ttk.Frame(self.viz_notebook)
+        self.viz_notebook.add(sensitivity_frame, text="Sensitivity")
+        self.sensitivity_fig = plt.figure(figsize=(10, 6))
+        self.sensitivity_canvas = FigureCanvasTkAgg(self.sensitivity_fig, sensitivity_frame)
+        self.sensitivity_canvas.get_tk_widget().pack(fill="both", expand=True)
+        NavigationToolbar2Tk(self.sensitivity_canvas, sensitivity_frame)
+        export_grid_button = ctk.CTkButton(sensitivity_frame, text="Export Grid", command=self.export_sensitivity_grid)
+        export_grid_button.pack(pady=5)
+        profit_distribution_frame = ttk.Frame(self.viz_notebook)
+        self.viz_notebook.add(profit_distribution_frame, text="Profit Distribution")
+        self.profit_distribution_fig, self.profit_distribution_ax = plt.subplots(figsize=(10, 6))
+        self.profit_distribution_canvas = FigureCanvasTkAgg(self.profit_distribution_fig, profit_distribution_frame)
+        self.profit_distribution_canvas.get_tk_widget().pack(fill="both", expand=True)
+        NavigationToolbar2Tk(self.profit_distribution_canvas, profit_distribution_frame)
+        self.profit_distribution_chart = ProfitDistributionChart(self.profit_distribution_ax, self.profit_distribution_canvas)
 
     def save_figure(self, fig):
         from tkinter import filedialog
         file_path = filedialog.asksaveasfilename(defaultextension=".png", filetypes=[("PNG files", "*.png"), ("PDF files", "*.pdf")])
         if file_path:
             fig.savefig(file_path)
-            CTkMessagebox(title="Save Successful", message=f"Chart saved to {file_path}", icon="info")
+            message_box(title="Save Successful", message=f"Chart saved to {file_path}", icon="info")
 
     def create_sidebar(self):
         cur = 0
@@ -303,62 +451,87 @@ class App(ctk.CTk):
         days_entry = ctk.CTkEntry(self.sidebar_frame, width=80, textvariable=self.days)
         days_entry.grid(row=cur, column=0, padx=20, pady=(5, 10), sticky="w")
         cur += 1
-        quantity_label = ctk.CTkLabel(self.sidebar_frame, text=f"Paper Quantity: {self.quantity.get()}")
-        quantity_label.grid(row=cur, column=0, padx=20, pady=(10, 0), sticky="w")
+        self.quantity_label = ctk.CTkLabel(self.sidebar_frame, text=f"Paper Quantity: {self.quantity.get()}")
+        self.quantity_label.grid(row=cur, column=0, padx=20, pady=(10, 0), sticky="w")
         cur += 1
         def update_quantity_label(value):
-            quantity_label.configure(text=f"Paper Quantity: {int(float(value))}")
+            self.quantity_label.configure(text=f"Paper Quantity: {int(float(value))}")
             self.quantity.set(int(float(value)))
-        quantity_slider = ctk.CTkSlider(self.sidebar_frame, from_=40, to=100, number_of_steps=60, command=update_quantity_label)
-        quantity_slider.set(self.quantity.get())
-        quantity_slider.grid(row=cur, column=0, padx=20, pady=(5, 10), sticky="ew")
+        self.quantity_slider = ctk.CTkSlider(self.sidebar_frame, from_=40, to=100, number_of_steps=60, command=update_quantity_label)
+        self.quantity_slider.set(self.quantity.get())
+        self.quantity_slider.grid(row=cur, column=0, padx=20, pady=(5, 10), sticky="ew")
         cur += 1
         iterations_label = ctk.CTkLabel(self.sidebar_frame, text="Number of Iterations:")
         iterations_label.grid(row=cur, column=0, padx=20, pady=(10, 0), sticky="w")
         cur += 1
-        self.iterations_value_label = ctk.CTkLabel(self.sidebar_frame, text=f"{self.iterations.get()} iterations")
-        self.iterations_value_label.grid(row=cur, column=0, padx=20, pady=(5, 0), sticky="w")
+        # The entry takes any count; the slider covers the everyday range.
+        iterations_entry = ctk.CTkEntry(self.sidebar_frame, width=100, textvariable=self.iterations)
+        iterations_entry.grid(row=cur, column=0, padx=20, pady=(5, 0), sticky="w")
         cur += 1
-        def update_iterations_label(value):
-            self.iterations_value_label.configure(text=f"{int(value)} iterations")
-            self.iterations.set(int(value))
-        iterations_slider = ctk.CTkSlider(self.sidebar_frame, from_=1, to=1000, number_of_steps=999, command=update_iterations_label)
+        iterations_slider = ctk.CTkSlider(self.sidebar_frame, from_=1, to=1000, number_of_steps=999, command=lambda value: self.iterations.set(int(value)))
         iterations_slider.set(self.iterations.get())
         iterations_slider.grid(row=cur, column=0, padx=20, pady=(5, 10), sticky="ew")
         cur += 1
-        separator2 = ttk.Separator(self.sidebar_frame, orient='horizontal')
-        separator2.grid(row=cur, column=0, sticky="ew", padx=15, pady=10)
+        seed_label = ctk.CTkLabel(self.sidebar_frame, text="Random Seed (blank = random):")
+        seed_label.grid(row=cur, column=0, padx=20, pady=(10, 0), sticky="w")
         cur += 1
-        probs_label = ctk.CTkLabel(self.sidebar_frame, text="Day Type Probabilities", font=ctk.CTkFont(size=16, weight="bold"))
-        probs_label.grid(row=cur, column=0, padx=20, pady=(10, 10), sticky="w")
+        seed_entry = ctk.CTkEntry(self.sidebar_frame, width=120, textvariable=self.seed)
+        seed_entry.grid(row=cur, column=0, padx=20, pady=(5, 10), sticky="w")
         cur += 1
-        good_label = ctk.CTkLabel(self.sidebar_frame, text="Good Day Probability:")
-        good_label.grid(row=cur, column=0, padx=20, pady=(10, 0), sticky="w")
+        workers_label = ctk.CTkLabel(self.sidebar_frame, text="Worker Processes:")
+        workers_label.grid(row=cur, column=0, padx=20, pady=(10, 0), sticky="w")
         cur += 1
-        good_entry = ctk.CTkEntry(self.sidebar_frame, width=80, textvariable=self.good_prob)
-        good_entry.grid(row=cur, column=0, padx=20, pady=(5, 10), sticky="w")
+        workers_entry = ctk.CTkEntry(self.sidebar_frame, width=80, textvariable=self.workers)
+        workers_entry.grid(row=cur, column=0, padx=20, pady=(5, 10), sticky="w")
         cur += 1
-        fair_label = ctk.CTkLabel(self.sidebar_frame, text="Fair Day Probability:")
-        fair_label.grid(row=cur, column=0, padx=20, pady=(10, 0), sticky="w")
+        target_label = ctk.CTkLabel(self.sidebar_frame, text="Target CI Half-Width ($, blank = off):")
+        target_label.grid(row=cur, column=0, padx=20, pady=(10, 0), sticky="w")
         cur += 1
-        fair_entry = ctk.CTkEntry(self.sidebar_frame, width=80, textvariable=self.fair_prob)
-        fair_entry.grid(row=cur, column=0, padx=20, pady=(5, 10), sticky="w")
+        target_entry = ctk.CTkEntry(self.sidebar_frame, width=80, textvariable=self.target_half_width)
+        target_entry.grid(row=cur, column=0, padx=20, pady=(5, 10), sticky="w")
         cur += 1
-        poor_label = ctk.CTkLabel(self.sidebar_frame, text="Poor Day Probability:")
-        poor_label.grid(row=cur, column=0, padx=20, pady=(10, 0), sticky="w")
+        sampling_label = ctk.CTkLabel(self.sidebar_frame, text="Sampling Mode:")
+        sampling_label.grid(row=cur, column=0, padx=20, pady=(10, 0), sticky="w")
         cur += 1
-        poor_entry = ctk.CTkEntry(self.sidebar_frame, width=80, textvariable=self.poor_prob)
-        poor_entry.grid(row=cur, column=0, padx=20, pady=(5, 10), sticky="w")
+        sampling_menu = ctk.CTkOptionMenu(self.sidebar_frame, values=SAMPLING_MODES, variable=self.sampling)
+        sampling_menu.grid(row=cur, column=0, padx=20, pady=(5, 10), sticky="w")
         cur += 1
-        def validate_probabilities(*args):
-            total = self.good_prob.get() + self.fair_prob.get() + self.poor_prob.get()
-            total_label.configure(text=f"Sum: {total:.2f}", text_color="green" if abs(total - 1.0) < 0.001 else "red")
-        total_label = ctk.CTkLabel(self.sidebar_frame, text="Sum: 1.00", text_color="green")
-        total_label.grid(row=cur, column=0, padx=20, pady=(5, 10), sticky="w")
+        backend_label = ctk.CTkLabel(self.sidebar_frame, text="Kernel Backend:")
+        backend_label.grid(row=cur, column=0, padx=20, pady=(10, 0), sticky="w")
+        cur += 1
+        backend_menu = ctk.CTkOptionMenu(self.sidebar_frame, values=BACKENDS, variable=self.backend)
+        backend_menu.grid(row=cur, column=0, padx=20, pady=(5, 10), sticky="w")
+        cur += 1
+        validate_checkbox = ctk.CTkCheckBox(self.sidebar_frame, text="Validate against exact model", variable=self.validate_exact)
+        validate_checkbox.grid(row=cur, column=0, padx=20, pady=(5, 10), sticky="w")
+        cur += 1
+        disk_checkbox = ctk.CTkCheckBox(self.sidebar_frame, text="Keep per-day results on disk", variable=self.store_on_disk)
+        disk_checkbox.grid(row=cur, column=0, padx=20, pady=(0, 10), sticky="w")
+        cur += 1
+        service_label = ctk.CTkLabel(self.sidebar_frame, text="Simulation Service URL (blank = local):")
+        service_label.grid(row=cur, column=0, padx=20, pady=(10, 0), sticky="w")
+        cur += 1
+        service_entry = ctk.CTkEntry(self.sidebar_frame, width=200, textvariable=self.service_url, placeholder_text="http://127.0.0.1:8765")
+        service_entry.grid(row=cur, column=0, padx=20, pady=(5, 10), sticky="w")
+        cur += 1
+        separator2 = ttk.Separator(self.sidebar_frame, orient='horizontal')
+        separator2.grid(row=cur, column=0, sticky="ew", padx=15, pady=10)
+        cur += 1
+        probs_label = ctk.CTkLabel(self.sidebar_frame, text="Day Type Probabilities", font=ctk.CTkFont(size=16, weight="bold"))
+        probs_label.grid(row=cur, column=0, padx=20, pady=(10, 10), sticky="w")
+        cur += 1
+        self.day_type_frame = ctk.CTkFrame(self.sidebar_frame, fg_color="transparent")
+        self.day_type_frame.grid(row=cur, column=0, sticky="ew")
+        self.build_day_type_entries()
+        cur += 1
+        schedule_frame = ctk.CTkFrame(self.sidebar_frame, fg_color="transparent")
+        schedule_frame.grid(row=cur, column=0, padx=20, pady=(0, 5), sticky="ew")
+        ctk.CTkButton(schedule_frame, text="Load Schedule...", width=120, command=self.load_schedule_file).pack(side="left")
+        ctk.CTkButton(schedule_frame, text="Clear", width=60, command=lambda: self.set_schedule(None)).pack(side="left", padx=(5, 0))
+        cur += 1
+        schedule_label = ctk.CTkLabel(self.sidebar_frame, textvariable=self.schedule_status, wraplength=220, justify="left")
+        schedule_label.grid(row=cur, column=0, padx=20, pady=(0, 10), sticky="w")
         cur += 1
-        self.good_prob.trace_add("write", validate_probabilities)
-        self.fair_prob.trace_add("write", validate_probabilities)
-        self.poor_prob.trace_add("write", validate_probabilities)
         separator3 = ttk.Separator(self.sidebar_frame, orient='horizontal')
         separator3.grid(row=cur, column=0, sticky="ew", padx=15, pady=10)
         cur += 1
@@ -368,15 +541,134 @@ class App(ctk.CTk):
         analyze_button = ctk.CTkButton(self.sidebar_frame, text="Analyze Profit vs. Quantity", command=self.open_analyze_dialog)
         analyze_button.grid(row=cur, column=0, padx=20, pady=10, sticky="ew")
         cur += 1
+        sensitivity_button = ctk.CTkButton(self.sidebar_frame, text="Sensitivity Analysis", command=self.open_sensitivity_dialog)
+        sensitivity_button.grid(row=cur, column=0, padx=20, pady=(0, 10), sticky="ew")
+        cur += 1
         reset_button = ctk.CTkButton(self.sidebar_frame, text="Reset Parameters", command=self.reset)
         reset_button.grid(row=cur, column=0, padx=20, pady=5, sticky="ew")
         cur += 1
+        trace_checkbox = ctk.CTkCheckBox(self.sidebar_frame, text="Record performance trace", variable=self.record_trace,
+                                         command=lambda: profiling.set_enabled(self.record_trace.get()))
+        trace_checkbox.grid(row=cur, column=0, padx=20, pady=(10, 5), sticky="w")
+        cur += 1
+        diagnostics_button = ctk.CTkButton(self.sidebar_frame, text="Diagnostics", command=self.open_diagnostics_window)
+        diagnostics_button.grid(row=cur, column=0, padx=20, pady=5, sticky="ew")
+        cur += 1
         self.sidebar_frame.grid_rowconfigure(cur, weight=1)
 
+    def build_day_type_entries(self):
+        for widget in self.day_type_frame.winfo_children():
+            widget.destroy()
+        row = 0
+        for day_type, var in self.day_type_probs.items():
+            label = ctk.CTkLabel(self.day_type_frame, text=f"{day_type} Day Probability:")
+            label.grid(row=row, column=0, padx=20, pady=(10, 0), sticky="w")
+            entry = ctk.CTkEntry(self.day_type_frame, width=80, textvariable=var)
+            entry.grid(row=row + 1, column=0, padx=20, pady=(5, 10), sticky="w")
+            row += 2
+        def validate_probabilities(*args):
+            total = sum(var.get() for var in self.day_type_probs.values())
+            total_label.configure(text=f"Sum: {total:.2f}", text_color="green" if abs(total - 1.0) < 0.001 else "red")
+        total_label = ctk.CTkLabel(self.day_type_frame, text="Sum: 1.00", text_color="green")
+        total_label.grid(row=row, column=0, padx=20, pady=(5, 10), sticky="w")
+        for var in self.day_type_probs.values():
+            var.trace_add("write", validate_probabilities)
+        validate_probabilities()
+
+    def load_schedule_file(self):
+        if self.worker_running():
+            return
+        from tkinter import filedialog
+        file_path = filedialog.askopenfilename(filetypes=[("JSON files", "*.json")])
+        if not file_path:
+            return
+        try:
+            schedule = load_schedule(file_path, {day_type: var.get() for day_type, var in self.day_type_probs.items()})
+        except (OSError, ValueError, KeyError) as error:
+            message_box(title="Load Failed", message=str(error), icon="cancel")
+            return
+        self.set_schedule(schedule, os.path.basename(file_path))
+
+    def set_schedule(self, schedule, name=None):
+        # Weekdays or periods the file leaves out take the sidebar probabilities as they were when it was loaded.
+        self.day_type_schedule = schedule
+        if schedule is None:
+            self.schedule_status.set("Same probabilities every day")
+        else:
+            self.schedule_status.set(f"Schedule: {name} ({len(schedule['Periods'])} periods)")
+
+    def open_period_breakdown(self):
+        if not self.simulation_results or "Period Breakdown" not in self.simulation_results:
+            message_box(title="No Schedule", message="Run a simulation with a day type schedule first.", icon="warning")
+            return
+        breakdown = self.simulation_results["Period Breakdown"]
+        window = ctk.CTkToplevel(self)
+        window.title("Profit by Period")
+        window.geometry("620x400")
+        window.transient(self)
+        columns = ("Period", "Days", "Average Daily Profit", "Average Period Profit", "Share of Total Profit")
+        tree = ttk.Treeview(window, columns=columns, show="headings")
+        for column in columns:
+            tree.heading(column, text=column)
+            tree.column(column, width=110, anchor="center")
+        for row in breakdown:
+            tree.insert("", "end", values=(row["Period"], row["Days"], f"${row['Average Daily Profit']:.2f}",
+                                           f"${row['Average Period Profit']:.2f}", f"{row['Share of Total Profit']:.1%}"))
+        tree.pack(fill="both", expand=True, padx=10, pady=10)
+        def export():
+            from tkinter import filedialog
+            file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")], parent=window)
+            if file_path:
+                export_periods(file_path, breakdown)
+                message_box(title="Export Successful", message=f"Period breakdown exported to {file_path}", icon="info")
+        ctk.CTkButton(window, text="Export to CSV", command=export).pack(side="right", padx=10, pady=(0, 10))
+
+    def open_diagnostics_window(self):
+        window = ctk.CTkToplevel(self)
+        window.title("Diagnostics")
+        window.geometry("520x400")
+        window.transient(self)
+        textbox = ctk.CTkTextbox(window, font=ctk.CTkFont(family="Courier", size=12))
+        textbox.pack(fill="both", expand=True, padx=10, pady=10)
+        def refresh():
+            startup = STARTUP.report()
+            lines = [f"{'Startup Phase':<22}{'Seconds':>10}"]
+            lines += [f"{phase:<22}{seconds:>10.4f}" for phase, seconds in startup["Phases"].items()]
+            lines.append(f"{'Total':<22}{startup['Total']:>10.4f}")
+            lines += [f"{phase + ' (deferred)':<22}{seconds:>10.4f}" for phase, seconds in startup["Deferred"].items()]
+            lines += ["", f"{'Phase':<22}{'Seconds':>10}{'Calls':>8}{'Share':>8}"]
+            for phase in profiling.TRACER.breakdown():
+                lines.append(f"{phase['Phase']:<22}{phase['Seconds']:>10.4f}{phase['Calls']:>8}{phase['Share']:>8.1%}")
+            lines.append("")
+            lines += [f"{name:<22}{value:>10,}" for name, value in profiling.TRACER.counters.items()]
+            if not self.record_trace.get():
+                lines.append("\nTracing is off. Enable 'Record performance trace' in the sidebar.")
+            textbox.configure(state="normal")
+            textbox.delete("1.0", "end")
+            textbox.insert("1.0", "\n".join(lines))
+            textbox.configure(state="disabled")
+        def export_trace():
+            from tkinter import filedialog
+            file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Chrome trace", "*.json")])
+            if file_path:
+                profiling.TRACER.export(file_path)
+                message_box(title="Trace Exported", message=f"Trace saved to {file_path}", icon="info")
+        def clear():
+            profiling.TRACER.clear()
+            refresh()
+        button_frame = ctk.CTkFrame(window)
+        button_frame.pack(fill="x", padx=10, pady=(0, 10))
+        ctk.CTkButton(button_frame, text="Export Trace", command=export_trace).pack(side="right", padx=5)
+        ctk.CTkButton(button_frame, text="Clear", command=clear).pack(side="right", padx=5)
+        ctk.CTkButton(button_frame, text="Refresh", command=refresh).pack(side="right", padx=5)
+        refresh()
+
     def open_analyze_dialog(self):
+        if self.worker_running():
+            return
         dialog = ctk.CTkToplevel(self)
         dialog.title("Analyze Profit vs. Quantity")
-        dialog.geometry("300x200")
+        dialog.geometry("300x420")
         min_label = ctk.CTkLabel(dialog, text="Min Quantity:")
         min_label.pack(pady=5)
         self.min_quantity_entry = ctk.CTkEntry(dialog)
@@ -389,6 +681,15 @@ class App(ctk.CTk):
         step_label.pack(pady=5)
         self.step_entry = ctk.CTkEntry(dialog)
         self.step_entry.pack(pady=5)
+        method_label = ctk.CTkLabel(dialog, text="Method:")
+        method_label.pack(pady=5)
+        self.analysis_method = ctk.CTkOptionMenu(dialog, values=["Monte Carlo", "Exact", "Both", "Optimize"])
+        self.analysis_method.pack(pady=5)
+        indifference_label = ctk.CTkLabel(dialog, text="Optimize: Indifference Zone ($/day):")
+        indifference_label.pack(pady=5)
+        self.indifference_entry = ctk.CTkEntry(dialog)
+        self.indifference_entry.insert(0, "0.01")
+        self.indifference_entry.pack(pady=5)
         run_button = ctk.CTkButton(dialog, text="Run Analysis", command=lambda: self.run_profit_quantity_analysis(dialog))
         run_button.pack(pady=10)
 
@@ -398,207 +699,365 @@ class App(ctk.CTk):
             max_qty = int(self.max_quantity_entry.get())
             step = int(self.step_entry.get())
             if min_qty >= max_qty or step <= 0:
-                CTkMessagebox(title="Invalid Input", message="Please enter valid min, max, and step values.", icon="warning")
+                message_box(title="Invalid Input", message="Please enter valid min, max, and step values.", icon="warning")
                 return
             quantities = list(range(min_qty, max_qty + 1, step))
+            if not self.validate_parameters():
+                return
+            params, cum_demand_dist = self.get_parameters(), self.cum_demand_dist
+            workers = self.workers.get()
+            method = self.analysis_method.get()
+            indifference = float(self.indifference_entry.get())
+            if indifference <= 0:
+                message_box(title="Invalid Input", message="The indifference zone must be a positive amount.", icon="warning")
+                return
             dialog.destroy()
-            self.simulation_status.set("Running profit vs. quantity analysis...")
-            self.progress_bar.start()
-            self.update_idletasks()
-            def analysis_thread():
-                results = []
-                for qty in quantities:
-                    self.after(0, lambda q=qty: self.simulation_status.set(f"Simulating quantity {q}..."))
-                    avg_profit = self.simulate_for_quantity(qty)
-                    results.append((qty, avg_profit))
-                self.after(0, lambda: self.on_analysis_complete(results))
-            threading.Thread(target=analysis_thread, daemon=True).start()
+            if method == "Optimize":
+                def optimization_thread(progress, cancel):
+                    return "optimization", optimize_quantity(params, cum_demand_dist, quantities, indifference, progress=progress, cancel=cancel)
+                self.start_worker(optimization_thread, "Searching for the optimal quantity...")
+                return
+            exact = None
+            if method != "Monte Carlo":
+                exact = list(zip(quantities, expected_outcomes(params, cum_demand_dist, quantities)["Expected Profit"].tolist()))
+            if method == "Exact":
+                self.on_analysis_complete(None, exact)
+                return
+            service_url, demand_dist, backend = self.service_url.get().strip(), self.demand_dist, self.backend.get()
+            def analysis_thread(progress, cancel):
+                if service_url:
+                    client = ServiceClient(service_url)
+                    job = client.submit("analysis", params, demand_dist, quantities)
+                    if client.wait(job["Id"], cancel)["Status"] != "done":
+                        return "error", "Stopped waiting; the sweep keeps running on the service and a rerun will pick it up."
+                    result = client.result(job["Id"])
+                    return "analysis", list(zip(result["Quantities"], result["Average Profits"])), exact
+                profits = sweep_quantities(params, cum_demand_dist, quantities, workers, progress, cancel, backend)
+                return "analysis", list(zip(quantities, profits.tolist())), exact
+            self.start_worker(analysis_thread, "Running profit vs. quantity analysis...")
         except ValueError:
-            CTkMessagebox(title="Invalid Input", message="Please enter integer values for quantities and step.", icon="warning")
-
-    def simulate_for_quantity(self, quantity):
-        p = self.paper_sell_price.get()
-        c = self.paper_cost.get()
-        s = self.scrap_sale_price.get()
-        days = self.days.get()
-        iterations = self.iterations.get()
-        day_type_probs = {"Good": self.good_prob.get(), "Fair": self.fair_prob.get(), "Poor": self.poor_prob.get()}
-        cum_day_type_prob = {}
-        cumulative = 0.0
-        for day_type, prob in sorted(day_type_probs.items()):
-            cumulative += prob
-            cum_day_type_prob[day_type] = cumulative
-        if not hasattr(self, 'cum_demand_dist'):
-            self.calculate_cumulative_distributions()
-        total_profits = []
-        for iteration in range(iterations):
-            iteration_profit = 0
-            for day in range(1, days + 1):
-                day_rnd = random.random()
-                day_type = "Poor"
-                for dtype, cum_prob in cum_day_type_prob.items():
-                    if day_rnd < cum_prob:
-                        day_type = dtype
-                        break
-                demand_rnd = random.random()
-                demand = 0
-                for d, cum_prob in sorted(self.cum_demand_dist[day_type].items()):
-                    if demand_rnd < cum_prob:
-                        demand = d
-                        break
-                revenue = min(demand, quantity) * p
-                excess_demand = max(0, demand - quantity)
-                lost_profit = excess_demand * (p - c)
-                num_scraps = max(0, quantity - demand)
-                salvage = num_scraps * s
-                daily_profit = revenue - (quantity * c) + salvage
-                iteration_profit += daily_profit
-            total_profits.append(iteration_profit / days)
-        avg_profit = sum(total_profits) / iterations
-        return avg_profit
-
-    def on_analysis_complete(self, results):
-        self.progress_bar.stop()
-        self.simulation_status.set("Analysis complete.")
-        quantities, profits = zip(*results)
+            message_box(title="Invalid Input", message="Please enter integer quantities and step and a numeric indifference zone.", icon="warning")
+
+    def open_sensitivity_dialog(self):
+        if self.worker_running():
+            return
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Sensitivity Analysis")
+        dialog.geometry("560x260")
+        choices = ["None"] + sensitivity_parameters(list(self.day_type_probs))
+        defaults = [("Paper Sell Price", 0.4, 0.7, 7), ("Paper Cost", 0.2, 0.4, 5), ("None", 0.0, 1.0, 5)]
+        for col, heading in enumerate(["Parameter", "Min", "Max", "Points"]):
+            ctk.CTkLabel(dialog, text=heading).grid(row=0, column=col, padx=5, pady=5)
+        rows = []
+        for row, (name, low, high, points) in enumerate(defaults, 1):
+            menu = ctk.CTkOptionMenu(dialog, values=choices, width=200)
+            menu.set(name)
+            menu.grid(row=row, column=0, padx=5, pady=5)
+            entries = []
+            for col, value in enumerate((low, high, points), 1):
+                entry = ctk.CTkEntry(dialog, width=80)
+                entry.insert(0, str(value))
+                entry.grid(row=row, column=col, padx=5, pady=5)
+                entries.append(entry)
+            rows.append((menu, *entries))
+        run_button = ctk.CTkButton(dialog, text="Run Grid", command=lambda: self.run_sensitivity_analysis(dialog, rows))
+        run_button.grid(row=len(rows) + 1, column=0, columnspan=4, pady=10)
+
+    def run_sensitivity_analysis(self, dialog, rows):
+        axes = {}
+        try:
+            for menu, low, high, points in rows:
+                if menu.get() != "None":
+                    axes[menu.get()] = np.linspace(float(low.get()), float(high.get()), int(points.get()))
+        except ValueError:
+            message_box(title="Invalid Input", message="Please enter numeric ranges and an integer number of points.", icon="warning")
+            return
+        if len(axes) < 2 or any(len(values) < 1 for values in axes.values()):
+            message_box(title="Invalid Input", message="Choose at least two different parameters, each with one or more points.", icon="warning")
+            return
+        if not self.validate_parameters():
+            return
+        params, cum_demand_dist = self.get_parameters(), self.cum_demand_dist
+        dialog.destroy()
+        def sensitivity_thread(progress, cancel):
+            return "sensitivity", sensitivity_grid(params, cum_demand_dist, axes, progress, cancel)
+        self.start_worker(sensitivity_thread, "Running sensitivity grid...")
+
+    def on_sensitivity_complete(self, result):
+        self.ensure_visualizations()
+        self.sensitivity_result = result
+        names, values = result["Axes"], result["Values"]
+        points = result["Expected Profit"].size
+        self.simulation_status.set(f"Sensitivity grid: {points} points in {result['Elapsed']:.2f}s from {result['Sample Days']:,} sampled days "
+                                   f"({result['Separate Run Days']:,} as separate runs).")
+        # Axes past the first two are shown at the grid value closest to the sidebar setting.
+        index = tuple(slice(None) if i < 2 else int(np.abs(np.array(v) - result["Base"][name]).argmin())
+                      for i, (name, v) in enumerate(zip(names, values)))
+        fixed = ", ".join(f"{name} = {v[i]:.3g}" for name, v, i in zip(names[2:], values[2:], index[2:]))
+        self.sensitivity_fig.clear()
+        for position, (metric, cmap, fmt) in enumerate([("Expected Profit", "viridis", "{:.2f}"), ("Optimal Quantity", "magma", "{:.0f}")], 1):
+            ax = self.sensitivity_fig.add_subplot(1, 2, position)
+            data = np.asarray(result[metric][index], dtype=np.float64).T
+            image = ax.imshow(data, origin="lower", aspect="auto", cmap=cmap)
+            ax.set_xticks(range(len(values[0])), [f"{v:.3g}" for v in values[0]])
+            ax.set_yticks(range(len(values[1])), [f"{v:.3g}" for v in values[1]])
+            ax.set(xlabel=names[0], ylabel=names[1], title=metric if metric != "Expected Profit" else f"Expected Profit (Q={result['Quantity']})")
+            if data.size <= 144:
+                for (y, x), value in np.ndenumerate(data):
+                    ax.text(x, y, fmt.format(value), ha="center", va="center", fontsize=8, color="white")
+            self.sensitivity_fig.colorbar(image, ax=ax)
+        if fixed:
+            self.sensitivity_fig.suptitle(fixed)
+        self.sensitivity_fig.tight_layout()
+        self.sensitivity_canvas.draw()
+        self.tabview.set("Visualizations")
+        self.viz_notebook.select(3)
+
+    def export_sensitivity_grid(self):
+        if getattr(self, "sensitivity_result", None) is None:
+            message_box(title="No Data", message="Run a sensitivity analysis first.", icon="warning")
+            return
+        from tkinter import filedialog
+        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+        if file_path:
+            export_grid(file_path, self.sensitivity_result)
+            message_box(title="Export Successful", message=f"Grid exported to {file_path}", icon="info")
+
+    def simulate_for_quantity(self, params, quantity, workers=1):
+        return float(sweep_quantities(params, self.cum_demand_dist, [quantity], workers, backend=self.backend.get())[0])
+
+    def on_analysis_complete(self, results, exact=None):
+        self.ensure_visualizations()
+        cancelled = results is not None and self.cancel_event.is_set()
+        self.simulation_status.set("Analysis cancelled; showing partial results." if cancelled else "Analysis complete.")
         self.profit_quantity_ax.clear()
-        self.profit_quantity_ax.plot(quantities, profits, marker='o')
+        if results:
+            quantities, profits = zip(*results)
+            self.profit_quantity_ax.plot(quantities, profits, marker='o', label='Monte Carlo')
+        if exact:
+            quantities, profits = zip(*exact)
+            self.profit_quantity_ax.plot(quantities, profits, linestyle='--', label='Exact')
         self.profit_quantity_ax.set(xlabel='Number of Newspapers', ylabel='Average Profit ($)', title='Average Profit vs. Quantity')
+        self.profit_quantity_ax.legend()
         self.profit_quantity_canvas.draw()
+        self.tabview.set("Visualizations")
+        self.viz_notebook.select(2)
+
+    def on_optimization_complete(self, result):
+        self.ensure_visualizations()
+        used, sweep = result["Simulated Days"], result["Sweep Simulated Days"]
+        self.simulation_status.set(f"{result['Statement']} Simulated {used:,} days ({used / sweep:.1%} of a full sweep).")
+        self.profit_quantity_ax.clear()
+        quantities, profits = zip(*result["Pilot"])
+        self.profit_quantity_ax.plot(quantities, profits, 'o', color='lightgray', label='Pilot (common random numbers)')
+        candidates = [c for c in result["Candidates"] if c["Observations"]]
+        if candidates:
+            self.profit_quantity_ax.plot([c["Quantity"] for c in candidates], [c["Average Daily Profit"] for c in candidates],
+                                         's', color='tab:blue', label='Ranking and selection')
+        self.profit_quantity_ax.errorbar([result["Best Quantity"]], [result["Average Daily Profit"]], yerr=[result["Confidence Half-Width"]],
+                                         fmt='*', color='tab:red', markersize=12, capsize=4, label=f"Best: Q={result['Best Quantity']}")
+        self.profit_quantity_ax.set(xlabel='Number of Newspapers', ylabel='Average Profit ($)', title='Optimal Quantity Search')
+        self.profit_quantity_ax.legend()
+        self.profit_quantity_canvas.draw()
+        self.tabview.set("Visualizations")
+        self.viz_notebook.select(2)
 
     def run_simulation(self):
-        if not self.validate_parameters():
+        if self.worker_running() or not self.validate_parameters():
             return
-        self.simulation_status.set("Running simulation...")
-        self.progress_bar.start()
+        params = self.get_parameters()
+        workers = self.workers.get()
+        # Only a seed the user typed can come round again; caching runs under a drawn seed would only churn the cache.
+        key = cache_key(params, self.demand_dist) if self.seed.get().strip() else None
+        # The worker uses the tables the key was built from, even if the distribution is saved while it runs.
+        service_url, demand_dist, cum_demand_dist = self.service_url.get().strip(), self.demand_dist, self.cum_demand_dist
+        store_on_disk, backend = self.store_on_disk.get(), self.backend.get()
+        def simulation_thread(progress, cancel):
+            # Cache lookups and saves read and write .npz files, so they run here and not on the Tk thread.
+            store, source = self.result_cache.get(key)
+            if store is not None:
+                return "simulation", build_results(params, store), source
+            if service_url:
+                # Thin-client mode: the service runs the job (or reuses an identical one) and we fetch its store.
+                client = ServiceClient(service_url)
+                job = client.submit("simulation", params, demand_dist)
+                if client.wait(job["Id"], cancel)["Status"] != "done":
+                    return "error", "Stopped waiting; the job keeps running on the service and a rerun will pick it up."
+                store = client.store(job["Id"])
+            else:
+                directory = None
+                if store_on_disk:
+                    os.makedirs(RUN_STORE_DIR, exist_ok=True)
+                    directory = tempfile.mkdtemp(dir=RUN_STORE_DIR)
+                try:
+                    store = simulate(params, cum_demand_dist, workers, progress, cancel, directory, backend)
+                except Exception:
+                    if directory:
+                        shutil.rmtree(directory, ignore_errors=True)
+                    raise
+            if not cancel.is_set():
+                self.result_cache.put(key, store)
+            return "simulation", build_results(params, store)
+        self.start_worker(simulation_thread, f"Running simulation on {service_url}..." if service_url else "Running simulation...")
+
+    def worker_running(self):
+        # One worker at a time: a second one would replace cancel_event, so Cancel could no longer reach the first,
+        # and its poll loop would share the message queue.
+        if self.worker_busy:
+            message_box(title="Run in Progress", message="Wait for the current run to finish, or cancel it first.", icon="warning")
+        return self.worker_busy
+
+    def start_worker(self, work, status):
+        if self.worker_running():
+            return
+        self.worker_busy = True
+        self.simulation_status.set(status)
+        self.cancel_event = threading.Event()
         self.run_button.configure(state="disabled")
-        self.update_idletasks()
-        def simulation_thread():
-            p = self.paper_sell_price.get()
-            c = self.paper_cost.get()
-            s = self.scrap_sale_price.get()
-            days = self.days.get()
-            quantity = self.quantity.get()
-            iterations = self.iterations.get()
-            day_type_probs = {"Good": self.good_prob.get(), "Fair": self.fair_prob.get(), "Poor": self.poor_prob.get()}
-            cum_day_type_prob = {}
-            cumulative = 0.0
-            for day_type, prob in sorted(day_type_probs.items()):
-                cumulative += prob
-                cum_day_type_prob[day_type] = cumulative
-            if not hasattr(self, 'cum_demand_dist'):
-                self.calculate_cumulative_distributions()
-            all_results = []
-            for iteration in range(iterations):
-                iteration_results = []
-                for day in range(1, days + 1):
-                    day_rnd = random.random()
-                    day_type = "Poor"
-                    for dtype, cum_prob in cum_day_type_prob.items():
-                        if day_rnd < cum_prob:
-                            day_type = dtype
-                            break
-                    demand_rnd = random.random()
-                    demand = 0
-                    for d, cum_prob in sorted(self.cum_demand_dist[day_type].items()):
-                        if demand_rnd < cum_prob:
-                            demand = d
-                            break
-                    revenue = min(demand, quantity) * p
-                    excess_demand = max(0, demand - quantity)
-                    lost_profit = excess_demand * (p - c)
-                    num_scraps = max(0, quantity - demand)
-                    salvage = num_scraps * s
-                    daily_profit = revenue - (quantity * c) + salvage
-                    day_result = {
-                        "Day": day, "Day Random": day_rnd, "Day Type": day_type, "Demand Random": demand_rnd,
-                        "Demand": demand, "Revenue": revenue, "Excess Demand": excess_demand, "Lost Profit": lost_profit,
-                        "Scraps": num_scraps, "Salvage": salvage, "Daily Profit": daily_profit
-                    }
-                    iteration_results.append(day_result)
-                total_profit = sum(result["Daily Profit"] for result in iteration_results)
-                avg_profit = total_profit / days
-                iteration_summary = {"Iteration": iteration + 1, "Total Profit": total_profit, "Average Profit": avg_profit, "Days": iteration_results}
-                all_results.append(iteration_summary)
-            total_profits = [result["Total Profit"] for result in all_results]
-            avg_total_profit = sum(total_profits) / iterations
-            avg_daily_profit = avg_total_profit / days
-            overall_summary = {
-                "Average Total Profit": avg_total_profit, "Average Daily Profit": avg_daily_profit, "Quantity": quantity,
-                "Min Profit": min(total_profits), "Max Profit": max(total_profits)
-            }
-            simulation_results = {
-                "Parameters": {
-                    "Paper Sell Price": p, "Paper Cost": c, "Scrap Sale Price": s, "Days": days, "Quantity": quantity,
-                    "Iterations": iterations, "Day Type Probabilities": day_type_probs
-                },
-                "Iterations": all_results, "Summary": overall_summary
-            }
-            self.after(0, lambda: self.on_simulation_complete(simulation_results))
-        threading.Thread(target=simulation_thread, daemon=True).start()
-
-    def on_simulation_complete(self, simulation_results):
+        self.cancel_button.configure(state="normal")
+        self.progress_bar.set(0)
+        def worker(cancel=self.cancel_event):
+            try:
+                self.messages.put(work(lambda report: self.messages.put(("progress", report)), cancel))
+            except Exception as exc:
+                self.messages.put(("error", str(exc)))
+        threading.Thread(target=worker, daemon=True).start()
+        self.after(100, self.poll_messages)
+
+    def cancel_run(self):
+        self.cancel_event.set()
+        self.cancel_button.configure(state="disabled")
+        self.simulation_status.set("Cancelling after the current chunk...")
+
+    def poll_messages(self):
+        while True:
+            try:
+                kind, *payload = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                self.on_progress(*payload)
+                continue
+            self.worker_busy = False
+            self.run_button.configure(state="normal")
+            self.cancel_button.configure(state="disabled")
+            self.progress_bar.set(1)
+            if kind == "simulation":
+                self.on_simulation_complete(*payload)
+            elif kind == "analysis":
+                self.on_analysis_complete(*payload)
+            elif kind == "sensitivity":
+                self.on_sensitivity_complete(*payload)
+            elif kind == "optimization":
+                self.on_optimization_complete(*payload)
+            elif kind == "export":
+                self.on_export_complete(*payload)
+            else:
+                self.simulation_status.set("Run failed.")
+                message_box(title="Simulation Error", message=payload[0], icon="cancel")
+            return
+        self.after(100, self.poll_messages)
+
+    def on_progress(self, report):
+        done, total = report["Iterations Done"], report["Iterations Total"]
+        self.progress_bar.set(done / total)
+        status = f"{done}/{total} iterations, {report['Elapsed']:.1f}s elapsed, ~{report['Remaining']:.1f}s left"
+        if "Average Daily Profit" in report:
+            status += f" | Avg. Daily Profit ${report['Average Daily Profit']:.2f} ± {report['Confidence Half-Width']:.3f}"
+        if not self.cancel_event.is_set():
+            self.simulation_status.set(status)
+
+    def on_simulation_complete(self, simulation_results, cache_source=None):
+        self.cache_status.set(self.result_cache.status())
+        self.remove_run_directory(keep=simulation_results["Iterations"].directory)
         self.simulation_results = simulation_results
-        self.progress_bar.stop()
         avg_daily_profit = simulation_results["Summary"]["Average Daily Profit"]
-        self.simulation_status.set(f"Simulation complete. Avg. Daily Profit: ${avg_daily_profit:.2f}")
-        self.run_button.configure(state="normal")
+        state = f"cancelled after {len(simulation_results['Iterations'])} iterations" if self.cancel_event.is_set() else "complete"
+        if cache_source:
+            state = f"loaded from {cache_source} cache"
+        self.simulation_status.set(f"Simulation {state}. Avg. Daily Profit: ${avg_daily_profit:.2f} (seed {simulation_results['Parameters']['Seed']})")
         self.display_simulation_results()
-        iterations = simulation_results["Parameters"]["Iterations"]
-        iteration_values = [str(i) for i in range(1, iterations + 1)]
+        iterations = len(simulation_results["Iterations"])
+        iteration_values = [str(i) for i in range(1, min(iterations, MAX_ITERATION_CHOICES) + 1)]
         self.iteration_combobox.configure(values=iteration_values)
         self.iteration_var.set("1")
         self.update_results_display("1")
         self.tabview.set("Simulation")
+        if self.record_trace.get():
+            self.simulation_status.set(f"{self.simulation_status.get()} | {profiling.TRACER.format_breakdown(3)}")
 
     def update_results_display(self, iteration_str):
-        iteration_idx = int(iteration_str) - 1
-        if not self.simulation_results or iteration_idx >= len(self.simulation_results["Iterations"]):
+        try:
+            iteration_idx = int(iteration_str) - 1
+        except ValueError:
+            return
+        if not self.simulation_results or not 0 <= iteration_idx < len(self.simulation_results["Iterations"]):
             return
-        days_data = self.simulation_results["Iterations"][iteration_idx]["Days"]
-        for item in self.results_tree.get_children():
-            self.results_tree.delete(item)
-        for day_data in days_data:
-            self.results_tree.insert("", "end", values=(
-                day_data["Day"], day_data["Day Type"], day_data["Demand"], f"${day_data['Revenue']:.2f}",
-                day_data["Excess Demand"], f"${day_data['Lost Profit']:.2f}", day_data["Scraps"], f"${day_data['Salvage']:.2f}",
-                f"${day_data['Daily Profit']:.2f}"
-            ))
+        store = self.simulation_results["Iterations"]
+        def fetch_rows(start, stop):
+            return [
+                (day, day_type, demand, f"${revenue:.2f}", excess, f"${lost:.2f}", scraps, f"${salvage:.2f}", f"${profit:.2f}")
+                for day, day_type, demand, revenue, excess, lost, scraps, salvage, profit in store.rows(iteration_idx, start, stop)
+            ]
+        self.results_table.set_source(store.days, fetch_rows)
         self.update_visualizations()
 
+    def update_profit_distribution(self):
+        if not self.simulation_results or self.viz_notebook is None:
+            return
+        with span("Profit Distribution Chart"):
+            self.profit_distribution_chart.update(self.simulation_results["Profit Distribution"], self.simulation_results["Summary"])
+
     def update_visualizations(self):
-        if not self.simulation_results:
+        if not self.simulation_results or self.viz_notebook is None:
             return
         iteration_idx = int(self.iteration_var.get()) - 1
-        days_data = self.simulation_results["Iterations"][iteration_idx]["Days"]
-        self.daily_profit_ax.clear()
-        days = [d["Day"] for d in days_data]
-        profits = [d["Daily Profit"] for d in days_data]
-        self.daily_profit_ax.bar(days, profits, color='skyblue', label='Daily Profit')
-        avg_profit = np.mean(profits)
-        self.daily_profit_ax.axhline(y=avg_profit, color='r', linestyle='-', label=f'Avg: ${avg_profit:.2f}')
-        self.daily_profit_ax.set(xlabel='Day', ylabel='Profit ($)', title=f'Daily Profits (Iteration {iteration_idx + 1})')
-        self.daily_profit_ax.legend()
-        self.daily_profit_canvas.draw()
-        self.demand_dist_ax.clear()
-        demands = sorted(self.demand_dist["Good"].keys())
-        width = 0.25
-        for i, day_type in enumerate(["Good", "Fair", "Poor"]):
-            probs = [self.demand_dist[day_type][d] for d in demands]
-            self.demand_dist_ax.bar(np.arange(len(demands)) + i * width, probs, width, label=day_type)
-        self.demand_dist_ax.set_xticks(np.arange(len(demands)) + width, demands)
-        self.demand_dist_ax.set(xlabel='Demand', ylabel='Probability', title='Demand Distribution by Day Type')
-        self.demand_dist_ax.legend()
-        self.demand_dist_canvas.draw()
+        store = self.simulation_results["Iterations"]
+        profits = store.columns["Daily Profit"][iteration_idx]
+        with span("Daily Profit Chart"):
+            self.daily_profit_chart.update(profits, store.average_profit[iteration_idx], iteration_idx)
+        with span("Demand Chart"):
+            self.demand_chart.update(self.demand_dist)
+
+    def get_parameters(self):
+        if not hasattr(self, 'cum_demand_dist'):
+            self.calculate_cumulative_distributions()
+        seed = self.seed.get().strip()
+        target = self.target_half_width.get().strip()
+        return {
+            "Paper Sell Price": self.paper_sell_price.get(), "Paper Cost": self.paper_cost.get(),
+            "Scrap Sale Price": self.scrap_sale_price.get(), "Days": self.days.get(), "Quantity": self.quantity.get(),
+            "Iterations": self.iterations.get(),
+            "Day Type Probabilities": {day_type: var.get() for day_type, var in self.day_type_probs.items()},
+            "Seed": int(seed) if seed else new_seed(), "Target Half-Width": float(target) if target else None,
+            "Sampling": self.sampling.get(), "Day Type Schedule": self.day_type_schedule
+        }
 
     def validate_parameters(self):
-        total_prob = self.good_prob.get() + self.fair_prob.get() + self.poor_prob.get()
-        if abs(total_prob - 1.0) > 0.001:
-            CTkMessagebox(title="Invalid Probabilities", message="Day type probabilities must sum to 1.", icon="warning")
+        seed = self.seed.get().strip()
+        if seed and not seed.isdigit():
+            message_box(title="Invalid Seed", message="Random seed must be a non-negative integer or left blank.", icon="warning")
+            return False
+        target = self.target_half_width.get().strip()
+        try:
+            if target and float(target) <= 0:
+                raise ValueError
+        except ValueError:
+            message_box(title="Invalid Precision", message="Target half-width must be a positive number or left blank.", icon="warning")
+            return False
+        try:
+            day_type_probs = {day_type: var.get() for day_type, var in self.day_type_probs.items()}
+            validate_distribution(day_type_probs, self.demand_dist)
+            validate_schedule(self.day_type_schedule, day_type_probs)
+        except ValueError as error:
+            message_box(title="Invalid Probabilities", message=str(error), icon="warning")
             return False
         return True
 
     def open_demand_distribution_window(self):
+        if self.worker_running():
+            return
+        from tkinter import filedialog
         demand_window = ctk.CTkToplevel(self)
         demand_window.title("Demand Distribution Setup")
         demand_window.geometry("500x600")
@@ -606,53 +1065,111 @@ class App(ctk.CTk):
         demand_window.grab_set()
         notebook = ttk.Notebook(demand_window)
         notebook.pack(fill='both', expand=True, padx=10, pady=10)
-        tab_frames = {}
-        entry_vars = {}
-        for day_type in ["Good", "Fair", "Poor"]:
+        editors = {}
+        day_type_probs = {day_type: var.get() for day_type, var in self.day_type_probs.items()}
+        loaded = {"File": None}
+        def add_tab(day_type, table):
             tab = ttk.Frame(notebook)
             notebook.add(tab, text=day_type)
-            tab_frames[day_type] = tab
-            ttk.Label(tab, text=f"Demand Distribution for {day_type} Days", font=('TkDefaultFont', 12, 'bold')).grid(row=0, column=0, columnspan=3, pady=10)
-            ttk.Label(tab, text="Demand").grid(row=1, column=0, padx=10, pady=5)
-            ttk.Label(tab, text="Probability").grid(row=1, column=1, padx=10, pady=5)
-            entry_vars[day_type] = {}
-            for i, demand in enumerate([40, 50, 60, 70, 80, 90, 100]):
-                ttk.Label(tab, text=str(demand)).grid(row=i + 2, column=0, padx=10, pady=5)
-                prob_var = tk.DoubleVar(value=self.demand_dist[day_type].get(demand, 0.0))
-                entry_vars[day_type][demand] = prob_var
-                prob_entry = ttk.Entry(tab, textvariable=prob_var, width=10)
-                prob_entry.grid(row=i + 2, column=1, padx=10, pady=5)
-                prob_var.trace_add("write", lambda *args, v=prob_var, n=f"{day_type} Demand {demand}": self.validate_prob(v, n))
+            ttk.Label(tab, text=f"Demand Distribution for {day_type} Days", font=('TkDefaultFont', 12, 'bold')).pack(pady=10)
+            ttk.Label(tab, text="One 'demand, probability' pair per line").pack()
+            editor = tk.Text(tab, width=30, height=20)
+            editor.insert("1.0", format_table(table))
+            editor.pack(fill="both", expand=True, padx=10, pady=5)
             sum_label = ttk.Label(tab, text="Sum: 0.00")
-            sum_label.grid(row=9, column=0, columnspan=2, pady=10)
-            def update_sum(day_type=day_type, label=sum_label):
-                total = sum(var.get() for var in entry_vars[day_type].values())
-                label.config(text=f"Sum: {total:.2f}", foreground="green" if abs(total - 1.0) < 0.001 else "red")
-            for var in entry_vars[day_type].values():
-                var.trace_add("write", lambda *args, dt=day_type, lbl=sum_label: update_sum(dt, lbl))
-            update_sum(day_type, sum_label)
+            sum_label.pack(pady=10)
+            def update_sum(*args):
+                try:
+                    entries = parse_table(editor.get("1.0", "end"))
+                except ValueError as error:
+                    sum_label.config(text=str(error), foreground="red")
+                    return
+                total = sum(entries.values())
+                sum_label.config(text=f"Sum: {total:.4f} over {len(entries)} levels", foreground="green" if abs(total - 1.0) < 0.001 else "red")
+            editor.bind("<KeyRelease>", update_sum)
+            update_sum()
+            editors[day_type] = editor
+        def show(demand_dist):
+            for tab in notebook.tabs():
+                notebook.nametowidget(tab).destroy()
+            editors.clear()
+            for day_type, table in demand_dist.items():
+                add_tab(day_type, table)
+        def read_tables():
+            try:
+                demand_dist = {day_type: parse_table(editor.get("1.0", "end")) for day_type, editor in editors.items()}
+                validate_demand_tables(demand_dist)
+                return demand_dist
+            except ValueError as error:
+                message_box(title="Invalid Distribution", message=str(error), icon="warning")
+                return None
+        def load_file():
+            file_path = filedialog.askopenfilename(filetypes=[("JSON files", "*.json")], parent=demand_window)
+            if not file_path:
+                return
+            try:
+                probs, demand_dist = load_distribution(file_path)
+            except (OSError, ValueError) as error:
+                message_box(title="Load Failed", message=str(error), icon="cancel")
+                return
+            day_type_probs.clear()
+            day_type_probs.update(probs)
+            loaded["File"] = file_path
+            show(demand_dist)
+        def save_file():
+            demand_dist = read_tables()
+            if demand_dist is None:
+                return
+            file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")], parent=demand_window)
+            if file_path:
+                save_distribution(file_path, {day_type: day_type_probs.get(day_type, 0.0) for day_type in demand_dist}, demand_dist)
+        def add_day_type():
+            day_type = (ctk.CTkInputDialog(text="Name of the new day type:", title="Add Day Type").get_input() or "").strip()
+            if day_type and day_type not in editors:
+                day_type_probs.setdefault(day_type, 0.0)
+                add_tab(day_type, {})
+                notebook.select(len(notebook.tabs()) - 1)
+        def remove_day_type():
+            if len(editors) <= 1:
+                return
+            day_type = notebook.tab(notebook.select(), "text")
+            notebook.nametowidget(notebook.select()).destroy()
+            editors.pop(day_type)
         def save_distributions():
-            for day_type in ["Good", "Fair", "Poor"]:
-                for demand, var in entry_vars[day_type].items():
-                    self.demand_dist[day_type][demand] = var.get()
+            demand_dist = read_tables()
+            if demand_dist is None:
+                return
+            self.demand_dist = demand_dist
+            if loaded["File"] or list(demand_dist) != list(self.day_type_probs):
+                # New day types start at probability 0 until they are given one in the sidebar.
+                self.set_day_types({day_type: day_type_probs.get(day_type, 0.0) for day_type in demand_dist})
+                self.build_day_type_entries()
+            if loaded["File"]:
+                self.default_day_type_probs = dict(day_type_probs)
             self.calculate_cumulative_distributions()
             demand_window.destroy()
             self.simulation_status.set("Demand distributions updated")
+        show(self.demand_dist)
         button_frame = ttk.Frame(demand_window)
         button_frame.pack(fill='x', padx=5, pady=5)
+        ttk.Button(button_frame, text="Load...", command=load_file).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Export...", command=save_file).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Add Day Type", command=add_day_type).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Remove Day Type", command=remove_day_type).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Save", command=save_distributions).pack(side='right', padx=5)
         ttk.Button(button_frame, text="Cancel", command=demand_window.destroy).pack(side='right', padx=5)
 
     def calculate_cumulative_distributions(self):
-        self.cum_demand_dist = {}
-        for day_type in self.demand_dist:
-            self.cum_demand_dist[day_type] = {}
-            cumulative = 0.0
-            for demand in sorted(self.demand_dist[day_type].keys()):
-                prob = self.demand_dist[day_type][demand]
-                cumulative += prob
-                self.cum_demand_dist[day_type][demand] = cumulative
+        # The lookup tables are built here, once per distribution change, and shared by every run after it.
+        self.cum_demand_dist = DemandTables(cumulative_demand_dist(self.demand_dist))
+        demands = [demand for table in self.demand_dist.values() for demand, prob in table.items() if prob > 0]
+        if demands and hasattr(self, "quantity_slider"):
+            low, high = min(demands), max(max(demands), min(demands) + 1)
+            self.quantity_slider.configure(from_=low, to=high, number_of_steps=high - low)
+            self.quantity.set(min(max(self.quantity.get(), low), high))
+            self.quantity_slider.set(self.quantity.get())
+            self.quantity_label.configure(text=f"Paper Quantity: {self.quantity.get()}")
 
 if __name__ == "__main__":
-    app = App()
+    app = App(startup_report="--startup-report" in sys.argv)
     app.mainloop()
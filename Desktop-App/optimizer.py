@@ -0,0 +1,147 @@
+from statistics import NormalDist
+import time
+import numpy as np
+from simulation import CHUNK_SIZE, CONFIDENCE, chunk_demand, progress_report, quantity_profits, replicate_means, replicate_size
+from stats import RunningStats
+
+PILOT_ITERATIONS = 4 * CHUNK_SIZE
+FIRST_STAGE_REPLICATES = 16
+MAX_CANDIDATES = 8
+
+
+def golden_section(value, lo, hi):
+    # value(i) is concave in i, so each comparison discards the side that cannot hold the maximum.
+    ratio = (5 ** 0.5 - 1) / 2
+    while hi - lo > 3:
+        a = lo + round((1 - ratio) * (hi - lo))
+        b = max(lo + round(ratio * (hi - lo)), a + 1)
+        if value(a) < value(b):
+            lo = a
+        else:
+            hi = b
+    return max(range(lo, hi + 1), key=value)
+
+
+def kn_constant(candidates, first_stage, confidence):
+    # Kim & Nelson (2001): h^2 = 2 * eta * (n0 - 1) for k candidates and error rate 1 - confidence.
+    eta = 0.5 * ((2 * (1 - confidence) / (candidates - 1)) ** (-2 / (first_stage - 1)) - 1)
+    return 2 * eta * (first_stage - 1)
+
+
+class QuantityOptimizer:
+    def __init__(self, params, cum_demand_dist, quantities, indifference=0.01, confidence=CONFIDENCE):
+        self.params = params
+        self.cum_demand_dist = cum_demand_dist
+        self.quantities = sorted(set(int(q) for q in quantities))
+        self.indifference = indifference
+        self.confidence = confidence
+        self.replicate_size = replicate_size(params.get("Sampling", "Plain"))
+        self.pilot_chunks = -(-min(PILOT_ITERATIONS, params["Iterations"]) // CHUNK_SIZE)
+        self.pilot = {}
+        self.pilot_demand = None
+        self.simulated_days = 0
+        self.sweep_days = len(self.quantities) * params["Iterations"] * params["Days"]
+
+    def profits(self, demand, quantities):
+        self.simulated_days += demand.size * len(quantities)
+        return np.array([replicate_means(row, self.replicate_size) for row in quantity_profits(self.params, demand, quantities)])
+
+    def demand(self, chunk_index):
+        # A chunk is drawn once for every quantity scored on it, so all comparisons use common random numbers.
+        start = chunk_index * CHUNK_SIZE
+        return chunk_demand(self.params, self.cum_demand_dist, (chunk_index, start, start + CHUNK_SIZE))
+
+    def pilot_value(self, index):
+        if self.pilot_demand is None:
+            self.pilot_demand = np.concatenate([self.demand(k) for k in range(self.pilot_chunks)])
+        if index not in self.pilot:
+            self.pilot[index] = self.profits(self.pilot_demand, [self.quantities[index]])[0]
+        return self.pilot[index].mean()
+
+    def screen(self, best):
+        # Walk out from the pilot optimum until a neighbour is clearly worse; concavity rules out anything further.
+        z = NormalDist().inv_cdf(self.confidence)
+        candidates = [best]
+        for step in (-1, 1):
+            index = best + step
+            while 0 <= index < len(self.quantities) and len(candidates) < MAX_CANDIDATES:
+                self.pilot_value(index)
+                diff = self.pilot[best] - self.pilot[index]
+                if diff.mean() > z * diff.std(ddof=1) / np.sqrt(len(diff)) + self.indifference:
+                    break
+                candidates.append(index)
+                index += step
+        return sorted(candidates)
+
+    def select(self, candidates, progress=None, cancel=None, started=None):
+        # Kim & Nelson's fully sequential procedure on fresh chunks, with pairwise variances from the first stage.
+        quantities = [self.quantities[i] for i in candidates]
+        alive = list(range(len(quantities)))
+        observations = [[] for _ in quantities]
+        eliminated = {}
+        chunk_index = self.pilot_chunks
+        h2 = s2 = None
+        guaranteed = len(alive) == 1
+        while len(alive) > 1:
+            if self.simulated_days >= self.sweep_days or (cancel is not None and cancel.is_set()):
+                break
+            values = self.profits(self.demand(chunk_index), [quantities[i] for i in alive])
+            chunk_index += 1
+            for i, row in zip(alive, values):
+                observations[i].append(row)
+            if progress is not None:
+                progress(progress_report(self.simulated_days // self.params["Days"], self.sweep_days // self.params["Days"], started))
+            data = np.array([np.concatenate(observations[i]) for i in alive])
+            r = data.shape[1]
+            if r < FIRST_STAGE_REPLICATES:
+                continue
+            if h2 is None:
+                h2 = kn_constant(len(quantities), r, self.confidence)
+                diffs = data[:, None, :] - data[None, :, :]
+                s2 = diffs.var(axis=2, ddof=1)
+                first = alive
+            rows = [first.index(i) for i in alive]
+            pair_s2 = s2[np.ix_(rows, rows)]
+            means = data.mean(axis=1)
+            slack = np.maximum(0.0, self.indifference / (2 * r) * (h2 * pair_s2 / self.indifference ** 2 - r))
+            beaten = (means[:, None] < means[None, :] - slack).any(axis=1)
+            for i in [i for i, out in zip(alive, beaten) if out]:
+                eliminated[i] = r
+            alive = [i for i, out in zip(alive, beaten) if not out]
+            if r > (h2 * pair_s2 / self.indifference ** 2).max():
+                guaranteed = True
+                break
+        guaranteed = guaranteed or len(alive) == 1
+        samples = [np.concatenate(obs) if obs else np.empty(0) for obs in observations]
+        best = max(alive, key=lambda i: samples[i].mean() if len(samples[i]) else -np.inf)
+        return quantities, samples, eliminated, best, guaranteed
+
+
+def optimize_quantity(params, cum_demand_dist, quantities, indifference=0.01, confidence=CONFIDENCE, progress=None, cancel=None):
+    started = time.perf_counter()
+    optimizer = QuantityOptimizer(params, cum_demand_dist, quantities, indifference, confidence)
+    pilot_best = golden_section(optimizer.pilot_value, 0, len(optimizer.quantities) - 1)
+    candidates = optimizer.screen(pilot_best)
+    quantities, samples, eliminated, best, guaranteed = optimizer.select(candidates, progress, cancel, started)
+    if not len(samples[best]):
+        samples[best] = optimizer.pilot[candidates[best]]
+    stats = RunningStats().update(samples[best])
+    if len(quantities) == 1:
+        statement = f"Q={quantities[best]} beat both neighbours on the pilot at {confidence:.0%} confidence; concavity rules out the rest."
+    elif guaranteed:
+        statement = (f"With {confidence:.0%} confidence, Q={quantities[best]} is within ${indifference:.2f}/day "
+                     f"of the best of the {len(quantities)} quantities left after screening.")
+    else:
+        statement = f"Stopped before the {confidence:.0%} guarantee was reached; Q={quantities[best]} is the current leader."
+    return {
+        "Best Quantity": quantities[best], "Average Daily Profit": stats.mean, "Confidence Half-Width": stats.half_width(confidence),
+        "Guaranteed": guaranteed, "Statement": statement,
+        "Pilot": sorted((optimizer.quantities[i], float(values.mean())) for i, values in optimizer.pilot.items()),
+        "Candidates": [
+            {"Quantity": q, "Average Daily Profit": float(samples[i].mean()) if len(samples[i]) else float("nan"),
+             "Observations": len(samples[i]), "Eliminated At": eliminated.get(i)}
+            for i, q in enumerate(quantities)
+        ],
+        "Simulated Days": optimizer.simulated_days, "Sweep Simulated Days": optimizer.sweep_days,
+        "Elapsed": time.perf_counter() - started
+    }
@@ -0,0 +1,104 @@
+from contextlib import nullcontext
+import json
+import os
+import threading
+import time
+
+NULL_SPAN = nullcontext()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "started")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.started, time.perf_counter() - self.started)
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.events = []
+            self.totals = {}
+            self.counters = {}
+            self.origin = time.perf_counter()
+
+    def record(self, name, started, duration, pid=None, tid=None):
+        with self.lock:
+            self.events.append((name, started - self.origin, duration, pid or os.getpid(), tid or threading.get_ident()))
+            total, calls = self.totals.get(name, (0.0, 0))
+            self.totals[name] = (total + duration, calls + 1)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def merge(self, events, counters):
+        # Events from a worker process carry their own clock, so they are re-based onto the moment they arrive.
+        offset = time.perf_counter() - max((start + duration for _, start, duration, _, _ in events), default=0.0)
+        for name, start, duration, pid, tid in events:
+            self.record(name, start + offset, duration, pid, tid)
+        for name, amount in counters.items():
+            self.count(name, amount)
+
+    def breakdown(self):
+        with self.lock:
+            grand_total = sum(total for total, _ in self.totals.values()) or 1.0
+            return [
+                {"Phase": name, "Seconds": total, "Calls": calls, "Share": total / grand_total}
+                for name, (total, calls) in sorted(self.totals.items(), key=lambda item: -item[1][0])
+            ]
+
+    def format_breakdown(self, limit=4):
+        phases = self.breakdown()[:limit]
+        return " | ".join(f"{p['Phase']} {p['Seconds'] * 1000:.0f}ms ({p['Share']:.0%})" for p in phases) or "No trace recorded"
+
+    def export(self, file_path):
+        # Chrome trace-event format, viewable in chrome://tracing or Perfetto.
+        with self.lock:
+            trace = [
+                {"name": name, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6, "pid": pid, "tid": tid}
+                for name, start, duration, pid, tid in self.events
+            ]
+            trace += [{"name": name, "ph": "C", "ts": 0, "pid": os.getpid(), "args": {name: value}} for name, value in self.counters.items()]
+        with open(file_path, "w") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+
+TRACER = Tracer()
+
+
+def span(name):
+    return Span(TRACER, name) if TRACER.enabled else NULL_SPAN
+
+
+def count(name, amount=1):
+    if TRACER.enabled:
+        TRACER.count(name, amount)
+
+
+def set_enabled(enabled):
+    TRACER.enabled = enabled
+
+
+def traced_call(function, *args):
+    # Runs in a worker process: trace into that process's tracer and ship the events back with the result.
+    TRACER.clear()
+    TRACER.enabled = True
+    try:
+        result = function(*args)
+        return result, TRACER.events, TRACER.counters
+    finally:
+        TRACER.enabled = False
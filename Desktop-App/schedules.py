@@ -0,0 +1,98 @@
+import json
+import numpy as np
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def period(name, days, day_type_probs):
+    return {"Name": str(name), "Days": int(days), "Day Type Probabilities": {day_type: float(prob) for day_type, prob in day_type_probs.items()}}
+
+
+def parse_schedule(data, day_type_probs):
+    # Every form becomes one list of periods that repeats over the horizon:
+    #   {"Periods": [{"Name": "Winter", "Days": 90, "Day Type Probabilities": {...}}, ...]}  seasons, holidays
+    #   {"Weekdays": {"Saturday": {...}, "Sunday": {...}}, "First Weekday": "Monday"}      weekly cycles
+    #   {"Days": [{...}, {...}, ...]}                                                        one entry per day
+    # Weekdays and periods given no probabilities use the scenario's Day Type Probabilities.
+    if not data:
+        return None
+    if "Periods" in data:
+        return {"Periods": [period(entry.get("Name", f"Period {i}"), entry.get("Days", 1),
+                                   entry.get("Day Type Probabilities", day_type_probs))
+                            for i, entry in enumerate(data["Periods"], 1)]}
+    if "Weekdays" in data:
+        unknown = set(data["Weekdays"]) - set(WEEKDAYS)
+        if unknown:
+            raise ValueError(f"Unknown weekdays in the schedule: {', '.join(sorted(unknown))}.")
+        first = WEEKDAYS.index(data.get("First Weekday", WEEKDAYS[0]))
+        weekdays = WEEKDAYS[first:] + WEEKDAYS[:first]
+        return {"Periods": [period(weekday, 1, data["Weekdays"].get(weekday, day_type_probs)) for weekday in weekdays]}
+    if "Days" in data:
+        return {"Periods": [period(f"Day {day}", 1, probs) for day, probs in enumerate(data["Days"], 1)]}
+    raise ValueError("A day type schedule needs Periods, Weekdays or Days.")
+
+
+def validate_schedule(schedule, day_type_probs, tolerance=1e-3):
+    if schedule is None:
+        return
+    if not schedule["Periods"]:
+        raise ValueError("A day type schedule needs at least one period.")
+    for entry in schedule["Periods"]:
+        probs = entry["Day Type Probabilities"]
+        if entry["Days"] < 1:
+            raise ValueError(f"Schedule period {entry['Name']} must last at least one day.")
+        if unknown := set(probs) - set(day_type_probs):
+            raise ValueError(f"Schedule period {entry['Name']} uses unknown day types: {', '.join(sorted(unknown))}.")
+        if any(prob < 0 for prob in probs.values()):
+            raise ValueError(f"Schedule period {entry['Name']} has a negative day type probability.")
+        if abs(sum(probs.values()) - 1.0) > tolerance:
+            raise ValueError(f"Schedule period {entry['Name']} day type probabilities must sum to 1.")
+
+
+def load_schedule(file_path, day_type_probs):
+    with open(file_path) as f:
+        data = json.load(f)
+    schedule = parse_schedule(data.get("Day Type Schedule", data), day_type_probs)
+    validate_schedule(schedule, day_type_probs)
+    return schedule
+
+
+def day_periods(schedule, days):
+    # Index into schedule["Periods"] for every day of the horizon, repeating the list as often as needed.
+    lengths = [entry["Days"] for entry in schedule["Periods"]]
+    cycle = np.repeat(np.arange(len(lengths), dtype=np.intp), lengths)
+    return np.resize(cycle, days)
+
+
+def schedule_rows(schedule, day_types, days):
+    # One probability row per period over the given day types (absent types get 0), plus the row each day uses.
+    rows = [{day_type: entry["Day Type Probabilities"].get(day_type, 0.0) for day_type in day_types} for entry in schedule["Periods"]]
+    return rows, day_periods(schedule, days)
+
+
+def horizon_day_type_probs(params):
+    # Share of the horizon's days expected to be of each type; with one order quantity for every day, the expected
+    # profit over the horizon only depends on this average.
+    day_type_probs = params["Day Type Probabilities"]
+    schedule = params.get("Day Type Schedule")
+    if not schedule:
+        return day_type_probs
+    rows, periods = schedule_rows(schedule, sorted(day_type_probs), params["Days"])
+    weights = np.bincount(periods, minlength=len(rows)) / len(periods)
+    return {day_type: float(sum(weight * row[day_type] for weight, row in zip(weights, rows))) for day_type in sorted(day_type_probs)}
+
+
+def period_breakdown(schedule, day_means):
+    # Periods that share a name (the same weekday in every week, a season in every year) are reported together.
+    periods = day_periods(schedule, len(day_means))
+    names = [entry["Name"] for entry in schedule["Periods"]]
+    total = float(day_means.sum())
+    breakdown = {}
+    for index, mean in zip(periods.tolist(), day_means.tolist()):
+        entry = breakdown.setdefault(names[index], {"Period": names[index], "Days": 0, "Average Period Profit": 0.0})
+        entry["Days"] += 1
+        entry["Average Period Profit"] += mean
+    for entry in breakdown.values():
+        entry["Average Daily Profit"] = entry["Average Period Profit"] / entry["Days"]
+        entry["Share of Total Profit"] = entry["Average Period Profit"] / total if total else float("nan")
+    return list(breakdown.values())
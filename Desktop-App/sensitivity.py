@@ -0,0 +1,120 @@
+import csv
+import itertools
+import time
+import numpy as np
+from distributions import as_demand_tables
+from profiling import count, span
+from schedules import horizon_day_type_probs
+from simulation import SWEEP_BATCH_CELLS, chunk_rng, progress_report
+
+PRICE_PARAMETERS = ["Paper Sell Price", "Paper Cost", "Scrap Sale Price"]
+SAMPLE_BLOCK = 1 << 20
+
+
+def probability_axis(day_type):
+    return f"{day_type} Day Probability"
+
+
+def sensitivity_parameters(day_types):
+    return PRICE_PARAMETERS + [probability_axis(day_type) for day_type in day_types]
+
+
+def base_value(params, name):
+    if name in PRICE_PARAMETERS:
+        return params[name]
+    return next(prob for day_type, prob in horizon_day_type_probs(params).items() if probability_axis(day_type) == name)
+
+
+def demand_histograms(params, cum_demand_dist):
+    # Iterations x Days demand draws per day type, reduced to counts; every grid point reuses this one sample.
+    tables = as_demand_tables(cum_demand_dist)
+    day_types = sorted(params["Day Type Probabilities"])
+    draws = params["Iterations"] * params["Days"]
+    width = int(tables.alias.values.max()) + 1
+    rng = chunk_rng(params["Seed"], 0)
+    counts = np.zeros((len(day_types), width))
+    with span("Random Draws"):
+        for i, row in enumerate(tables.rows_for(day_types).tolist()):
+            for start in range(0, draws, SAMPLE_BLOCK):
+                counts[i] += np.bincount(tables.alias.sample(rng.random(min(SAMPLE_BLOCK, draws - start)), row), minlength=width)
+    count("Simulated Days", draws * len(day_types))
+    return day_types, counts / max(draws, 1)
+
+
+def expected_sales(histograms):
+    # E[min(D, q)] for q = 0..max demand: the running sum of P(D > k) for k < q.
+    survival = 1.0 - np.cumsum(histograms, axis=1)
+    return np.concatenate([np.zeros((len(histograms), 1)), np.cumsum(survival, axis=1)], axis=1)
+
+
+def grid_day_type_probs(base, day_types, fixed, points):
+    # Day types set by an axis take their grid value; the others share what is left in their base proportions.
+    probs = np.tile(np.array([base.get(day_type, 0.0) for day_type in day_types], dtype=np.float64), (points, 1))
+    is_fixed = np.array([day_type in fixed for day_type in day_types])
+    for i, day_type in enumerate(day_types):
+        if day_type in fixed:
+            probs[:, i] = fixed[day_type]
+    rest = 1.0 - probs[:, is_fixed].sum(axis=1)
+    if is_fixed.all():
+        return probs, np.abs(rest) <= 1e-9
+    free = probs[:, ~is_fixed]
+    free_total = free.sum(axis=1, keepdims=True)
+    shares = np.where(free_total > 0, free / np.where(free_total > 0, free_total, 1.0), 1.0 / free.shape[1])
+    probs[:, ~is_fixed] = rest[:, None] * shares
+    # Points whose fixed probabilities already exceed one are not valid distributions.
+    return probs, rest >= -1e-9
+
+
+def sensitivity_grid(params, cum_demand_dist, axes, progress=None, cancel=None):
+    started = time.perf_counter()
+    names = list(axes)
+    values = [np.asarray(axes[name], dtype=np.float64) for name in names]
+    mesh = dict(zip(names, np.meshgrid(*values, indexing="ij"))) if names else {}
+    shape = tuple(len(v) for v in values)
+    day_types, histograms = demand_histograms(params, cum_demand_dist)
+    sales = expected_sales(histograms)
+    # Past the largest demand, sales stop growing; pad so the sidebar quantity is always on the curve.
+    sales = np.pad(sales, ((0, 0), (0, max(0, params["Quantity"] + 1 - sales.shape[1]))), mode="edge")
+    quantities = np.arange(sales.shape[1])
+    prices = [mesh.get(name, np.full(shape, params[name])).ravel() for name in PRICE_PARAMETERS]
+    fixed = {day_type: mesh[probability_axis(day_type)].ravel() for day_type in day_types if probability_axis(day_type) in mesh}
+    # Under a schedule, a probability axis sets the share of the horizon's days of that type, and the base mix is the
+    # schedule's average; with one quantity for every day, expected profit depends only on that average.
+    probs, valid = grid_day_type_probs(horizon_day_type_probs(params), day_types, fixed, int(np.prod(shape)))
+    quantity = params["Quantity"]
+    profit = np.full(len(probs), np.nan)
+    optimal_quantity = np.full(len(probs), -1)
+    optimal_profit = np.full(len(probs), np.nan)
+    batch = max(1, SWEEP_BATCH_CELLS // len(quantities))
+    with span("Profit Arithmetic"):
+        for first in range(0, len(probs), batch):
+            # Profit is linear in p, c and s once the demand sample is fixed, so each point is one matrix row.
+            part = slice(first, first + batch)
+            p, c, s = (price[part, None] for price in prices)
+            sold = probs[part] @ sales
+            curve = p * sold - c * quantities + s * (quantities - sold)
+            profit[part] = curve[:, quantity]
+            optimal_quantity[part] = curve.argmax(axis=1)
+            optimal_profit[part] = curve.max(axis=1)
+            if progress is not None:
+                progress(progress_report(min(first + batch, len(probs)), len(probs), started))
+            if cancel is not None and cancel.is_set():
+                break
+    profit[~valid], optimal_profit[~valid], optimal_quantity[~valid] = np.nan, np.nan, -1
+    count("Grid Points", len(probs))
+    return {
+        "Axes": names, "Values": [v.tolist() for v in values], "Quantity": quantity, "Day Types": day_types,
+        "Base": {name: base_value(params, name) for name in names},
+        "Expected Profit": profit.reshape(shape), "Optimal Quantity": optimal_quantity.reshape(shape),
+        "Optimal Profit": optimal_profit.reshape(shape), "Sample Days": params["Iterations"] * params["Days"] * len(day_types),
+        "Separate Run Days": int(np.prod(shape)) * params["Iterations"] * params["Days"], "Elapsed": time.perf_counter() - started
+    }
+
+
+def export_grid(file_path, result):
+    with open(file_path, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(result["Axes"] + [f"Expected Profit (Q={result['Quantity']})", "Optimal Quantity", "Optimal Profit"])
+        for index in itertools.product(*(range(len(v)) for v in result["Values"])):
+            point = [values[i] for values, i in zip(result["Values"], index)]
+            writer.writerow(point + [result["Expected Profit"][index], result["Optimal Quantity"][index], result["Optimal Profit"][index]])
@@ -0,0 +1,290 @@
+import argparse
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+import uuid
+from batch import parse_scenario
+from cache import DEFAULT_CACHE_DIR, cache_key
+from distributions import DemandTables
+from export import load_npz, save_npz
+from simulation import build_results, cumulative_demand_dist, simulate, sweep_quantities
+
+log = logging.getLogger("service")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+JOB_KINDS = ["simulation", "analysis"]
+MAX_BODY_BYTES = 16 * 2**20
+MAX_FINISHED_JOBS = 256
+STREAM_BLOCK_BYTES = 1 << 20
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 409: "Conflict", 413: "Payload Too Large",
+           503: "Service Unavailable"}
+
+
+def run_job(kind, scenario, quantities, store_path):
+    # Runs in a pool process; a simulation's per-day columns go to disk so only the summary crosses the pipe.
+    params = scenario["Parameters"]
+    cum_demand_dist = DemandTables(cumulative_demand_dist(scenario["Demand Distribution"]))
+    if kind == "analysis":
+        return {"Quantities": quantities, "Average Profits": sweep_quantities(params, cum_demand_dist, quantities).tolist()}
+    store = simulate(params, cum_demand_dist)
+    with open(store_path + ".tmp", "wb") as f:
+        save_npz(f, store, params)
+    os.replace(store_path + ".tmp", store_path)
+    results = build_results(params, store)
+    return {"Summary": results["Summary"], "Period Breakdown": results.get("Period Breakdown", [])}
+
+
+def job_key(kind, scenario, quantities):
+    canonical = {"Kind": kind, "Store": cache_key(scenario["Parameters"], scenario["Demand Distribution"]), "Quantities": quantities}
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+class Job:
+    def __init__(self, kind, scenario, quantities, key):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.scenario = scenario
+        self.quantities = quantities
+        self.key = key
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def describe(self):
+        return {
+            "Id": self.id, "Kind": self.kind, "Status": self.status, "Parameters": self.scenario["Parameters"], "Error": self.error,
+            "Queued Seconds": (self.started or time.time()) - self.submitted,
+            "Run Seconds": (self.finished or time.time()) - self.started if self.started else None
+        }
+
+
+class SimulationService:
+    def __init__(self, workers=os.cpu_count() or 1, queue_size=64, directory=os.path.join(DEFAULT_CACHE_DIR, "service")):
+        self.workers = workers
+        self.directory = directory
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.jobs = OrderedDict()
+        self.by_key = {}
+        self.deduplicated = 0
+        self.pool = None
+        self.runners = []
+
+    def store_path(self, job):
+        return os.path.join(self.directory, f"{job.id}.npz")
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        os.makedirs(self.directory, exist_ok=True)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.runners = [asyncio.create_task(self.run()) for _ in range(self.workers)]
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for runner in self.runners:
+            runner.cancel()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    def submit(self, spec):
+        kind = spec.get("Kind", "simulation")
+        if kind not in JOB_KINDS:
+            raise ValueError(f"unknown job kind {kind!r}, expected one of {', '.join(JOB_KINDS)}")
+        if "Distribution File" in spec.get("Scenario", {}):
+            # Paths would be resolved on the server, so clients send their tables inline.
+            raise ValueError("Distribution File is not accepted by the service; send Day Type Probabilities and Demand Distribution inline")
+        scenario = parse_scenario(spec.get("Scenario", {}), "job")
+        params = scenario["Parameters"]
+        if params["Days"] < 1 or params["Iterations"] < 1:
+            raise ValueError("Days and Iterations must be positive")
+        quantities = sorted(int(q) for q in spec.get("Quantities", [])) if kind == "analysis" else None
+        if kind == "analysis" and not quantities:
+            raise ValueError("an analysis job needs a non-empty Quantities list")
+        key = job_key(kind, scenario, quantities)
+        existing = self.by_key.get(key)
+        # Identical parameter sets, seed included, share one job; failed jobs may be retried.
+        if existing is not None and existing.status != "failed":
+            self.deduplicated += 1
+            return existing, True
+        job = Job(kind, scenario, quantities, key)
+        self.queue.put_nowait(job)
+        self.jobs[job.id] = job
+        self.by_key[key] = job
+        self.prune()
+        return job, False
+
+    def prune(self):
+        finished = [job for job in self.jobs.values() if job.status in ("done", "failed")]
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job.id]
+            if self.by_key.get(job.key) is job:
+                del self.by_key[job.key]
+            if os.path.exists(self.store_path(job)):
+                os.remove(self.store_path(job))
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job.status, job.started = "running", time.time()
+            try:
+                job.result = await loop.run_in_executor(self.pool, run_job, job.kind, job.scenario, job.quantities, self.store_path(job))
+                job.status = "done"
+            except Exception as exc:
+                job.status, job.error = "failed", str(exc)
+                log.warning("Job %s failed: %s", job.id, exc)
+            job.finished = time.time()
+            log.info("Job %s %s %s in %.2fs", job.id, job.kind, job.status, job.finished - job.started)
+            self.queue.task_done()
+
+    def status(self):
+        return {
+            "Queued": self.queue.qsize(), "Running": sum(job.status == "running" for job in self.jobs.values()),
+            "Jobs": len(self.jobs), "Workers": self.workers, "Queue Size": self.queue.maxsize, "Deduplicated": self.deduplicated
+        }
+
+    def route(self, method, path, body):
+        parts = [part for part in path.split("/") if part]
+        if method == "GET" and parts == ["status"]:
+            return 200, self.status()
+        if method == "POST" and parts == ["jobs"]:
+            try:
+                job, deduplicated = self.submit(json.loads(body or b"{}"))
+            except (ValueError, TypeError, AttributeError, KeyError, OSError) as exc:
+                return 400, {"Error": str(exc)}
+            except asyncio.QueueFull:
+                return 503, {"Error": f"The job queue is full ({self.queue.maxsize} jobs waiting)."}
+            return (200 if deduplicated else 202), dict(job.describe(), Deduplicated=deduplicated)
+        job = self.jobs.get(parts[1]) if len(parts) >= 2 and parts[0] == "jobs" else None
+        if method != "GET" or job is None or len(parts) > 3:
+            return 404, {"Error": f"No route for {method} {path}."}
+        if len(parts) == 2:
+            return 200, job.describe()
+        if job.status != "done":
+            return 409, job.describe()
+        if parts[2] == "result":
+            return 200, dict(job.describe(), Result=job.result)
+        if parts[2] == "store" and job.kind == "simulation":
+            return 200, self.store_path(job)
+        return 404, {"Error": f"No route for {method} {path}."}
+
+    async def handle(self, reader, writer):
+        # One request per connection: request line, headers, then a Content-Length body.
+        try:
+            method, target, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_BYTES:
+                status, payload = 413, {"Error": f"Request bodies are limited to {MAX_BODY_BYTES} bytes."}
+            else:
+                status, payload = self.route(method, urlsplit(target).path, await reader.readexactly(length))
+        except (ValueError, asyncio.IncompleteReadError):
+            status, payload = 400, {"Error": "Malformed HTTP request."}
+        try:
+            if isinstance(payload, str):
+                await self.send_file(writer, payload)
+            else:
+                body = json.dumps(payload).encode()
+                writer.write(self.head(status, "application/json", len(body)) + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def head(self, status, content_type, length):
+        return (f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {length}\r\nConnection: close\r\n\r\n").encode("latin-1")
+
+    async def send_file(self, writer, path):
+        writer.write(self.head(200, "application/octet-stream", os.path.getsize(path)))
+        with open(path, "rb") as f:
+            while block := f.read(STREAM_BLOCK_BYTES):
+                writer.write(block)
+                await writer.drain()
+
+
+class ServiceClient:
+    # Blocking client for the desktop app's worker threads; it needs only the standard library.
+    def __init__(self, url=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout=30.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def request(self, method, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode()
+        request = urllib.request.Request(self.url + path, data, {"Content-Type": "application/json"}, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+                return body if response.headers.get_content_type() != "application/json" else json.loads(body)
+        except urllib.error.HTTPError as error:
+            raise RuntimeError(json.loads(error.read() or b"{}").get("Error", f"HTTP {error.code}")) from None
+
+    def submit(self, kind, params, demand_dist, quantities=None):
+        scenario = dict(params, **{"Demand Distribution": {
+            day_type: {str(d): prob for d, prob in sorted(table.items())} for day_type, table in demand_dist.items()
+        }})
+        return self.request("POST", "/jobs", {"Kind": kind, "Scenario": scenario, "Quantities": quantities or []})
+
+    def wait(self, job_id, cancel=None, interval=0.25):
+        while True:
+            job = self.request("GET", f"/jobs/{job_id}")
+            if job["Status"] == "failed":
+                raise RuntimeError(f"Service job failed: {job['Error']}")
+            if job["Status"] == "done" or (cancel is not None and cancel.is_set()):
+                return job
+            time.sleep(interval)
+
+    def result(self, job_id):
+        return self.request("GET", f"/jobs/{job_id}/result")["Result"]
+
+    def store(self, job_id):
+        return load_npz(io.BytesIO(self.request("GET", f"/jobs/{job_id}/store")))
+
+    def status(self):
+        return self.request("GET", "/status")
+
+
+async def serve(host, port, workers, queue_size, directory):
+    service = SimulationService(workers, queue_size, directory)
+    address = await service.start(host, port)
+    log.info("Serving on http://%s:%d with %d workers and room for %d queued jobs", *address, workers, queue_size)
+    try:
+        await service.server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve simulations and Profit vs. Quantity sweeps as HTTP/JSON jobs.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on (default: localhost only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="jobs run concurrently in worker processes")
+    parser.add_argument("--queue-size", type=int, default=64, help="jobs allowed to wait before submissions are refused")
+    parser.add_argument("--directory", default=os.path.join(DEFAULT_CACHE_DIR, "service"), help="where finished runs are kept")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.queue_size, args.directory))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
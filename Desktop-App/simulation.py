@@ -0,0 +1,449 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from functools import partial
+import time
+import numpy as np
+from diskstore import MappedColumn, create_columns, open_columns, save_metadata
+from distributions import InverseCdfTable, as_demand_tables
+from kernels import KERNELS, choose_backend
+from profiling import TRACER, count, span, traced_call
+from schedules import day_periods, period_breakdown, schedule_rows
+from sketches import ProfitDistribution
+from stats import RunningStats
+
+ENGINE_VERSION = "4"
+CHUNK_SIZE = 64
+CONFIDENCE = 0.95
+SWEEP_BATCH_CELLS = 1 << 22
+STORE_BLOCK_CELLS = 1 << 22
+SAMPLING_MODES = ["Plain", "Antithetic", "Stratified", "Latin Hypercube"]
+LARGEST_RANDOM = np.nextafter(1.0, 0.0)
+
+DEFAULT_DEMAND_DIST = {
+    "Good": {40: 0.03, 50: 0.05, 60: 0.15, 70: 0.20, 80: 0.35, 90: 0.15, 100: 0.07},
+    "Fair": {40: 0.10, 50: 0.18, 60: 0.40, 70: 0.20, 80: 0.08, 90: 0.04, 100: 0.00},
+    "Poor": {40: 0.44, 50: 0.22, 60: 0.16, 70: 0.12, 80: 0.06, 90: 0.00, 100: 0.00}
+}
+
+DEFAULT_PARAMETERS = {
+    "Paper Sell Price": 0.5, "Paper Cost": 0.33, "Scrap Sale Price": 0.05, "Days": 30, "Quantity": 70,
+    "Iterations": 100, "Day Type Probabilities": {"Good": 0.35, "Fair": 0.45, "Poor": 0.20}, "Seed": None,
+    "Target Half-Width": None, "Sampling": "Plain", "Day Type Schedule": None
+}
+
+COLUMN_DTYPES = {
+    "Day Random": np.float64, "Day Type": np.int8, "Demand Random": np.float64, "Demand": np.int32,
+    "Revenue": np.float64, "Excess Demand": np.int32, "Lost Profit": np.float64, "Scraps": np.int32,
+    "Salvage": np.float64, "Daily Profit": np.float64
+}
+
+
+def cumulative_day_type_probs(day_type_probs):
+    cum_day_type_prob = {}
+    cumulative = 0.0
+    for day_type, prob in sorted(day_type_probs.items()):
+        cumulative += prob
+        cum_day_type_prob[day_type] = cumulative
+    return cum_day_type_prob
+
+
+def cumulative_demand_dist(demand_dist):
+    cum_demand_dist = {}
+    for day_type in demand_dist:
+        cum_demand_dist[day_type] = {}
+        cumulative = 0.0
+        for demand in sorted(demand_dist[day_type].keys()):
+            cumulative += demand_dist[day_type][demand]
+            cum_demand_dist[day_type][demand] = cumulative
+    return cum_demand_dist
+
+
+def sequential_sum(values, axis=-1):
+    # Left-to-right accumulation, so totals match the builtin sum() bit for bit.
+    return np.cumsum(values, axis=axis).take(-1, axis=axis)
+
+
+class LookupTables:
+    def __init__(self, cum_day_type_prob, cum_demand_dist, schedule=None):
+        # Every mode maps a random to the first entry whose cumulative probability exceeds it, as the original per-day
+        # loop did, so the same draws give the same days; the variance-reduction modes also rely on that order.
+        # A schedule gives one day-type row per period and the row each day uses, so a time-varying horizon is still
+        # sampled in one pass: each day's draw just reads its own row.
+        self.day_types = list(cum_day_type_prob)
+        cum_rows, self.day_rows = schedule if schedule is not None else ([cum_day_type_prob], None)
+        self.day_type_cum = np.array([list(row.values()) for row in cum_rows], dtype=np.float64)
+        # A random past the last cumulative probability falls back to the last type.
+        codes = list(range(len(self.day_types)))
+        self.day_type_table = InverseCdfTable([codes] * len(cum_rows), self.day_type_cum, len(codes) - 1)
+        demand_tables = as_demand_tables(cum_demand_dist)
+        self.demand_table = demand_tables.inverse
+        self.demand_rows = demand_tables.rows_for(self.day_types)
+        self.demand_values = []
+        self.demand_cum = []
+        for day_type in self.day_types:
+            table = sorted(cum_demand_dist.get(day_type, {}).items())
+            self.demand_values.append(np.array([demand for demand, _ in table], dtype=np.int64))
+            self.demand_cum.append(np.array([cum_prob for _, cum_prob in table], dtype=np.float64))
+
+    def day_rows_for(self, days):
+        return np.zeros(days, dtype=np.intp) if self.day_rows is None else self.day_rows
+
+    def day_type_codes(self, day_rnd):
+        rows = 0 if self.day_rows is None else self.day_rows
+        return self.day_type_table.sample(day_rnd, rows).astype(COLUMN_DTYPES["Day Type"])
+
+    def demands(self, day_type_codes, demand_rnd):
+        return self.demand_table.sample(demand_rnd, self.demand_rows[day_type_codes]).astype(COLUMN_DTYPES["Demand"])
+
+
+def lookup_tables(params, cum_demand_dist):
+    cum_day_type_prob = cumulative_day_type_probs(params["Day Type Probabilities"])
+    schedule = params.get("Day Type Schedule")
+    if schedule:
+        rows, day_rows = schedule_rows(schedule, list(cum_day_type_prob), params["Days"])
+        schedule = [cumulative_day_type_probs(row) for row in rows], day_rows
+    return LookupTables(cum_day_type_prob, cum_demand_dist, schedule)
+
+
+def new_seed():
+    return int(np.random.SeedSequence().generate_state(1)[0])
+
+
+def iteration_chunks(iterations, chunk_size=CHUNK_SIZE):
+    return [(index, start, min(start + chunk_size, iterations)) for index, start in enumerate(range(0, iterations, chunk_size))]
+
+
+def chunk_rng(seed, chunk_index):
+    # Each chunk owns the stream spawned for its index, so results do not depend on which worker ran it.
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(chunk_index,)))
+
+
+def draw_randoms(rng, iterations, days, sampling="Plain"):
+    if sampling == "Antithetic":
+        # Iteration 2k + 1 replays iteration 2k with every random u replaced by 1 - u.
+        half = rng.random((2, (iterations + 1) // 2, 1, days))
+        randoms = np.concatenate([half, 1.0 - half], axis=2).reshape(2, -1, days)[:, :iterations]
+    elif sampling == "Stratified":
+        # For each day, the chunk's iterations split [0, 1) into one slice each for the day-type draw; demand draws
+        # stay plain. Each iteration is still a random horizon, so its total profit keeps the plain spread.
+        strata = rng.permuted(np.broadcast_to(np.arange(iterations)[:, None], (iterations, days)), axis=0)
+        day_rnd = np.minimum((strata + rng.random((iterations, days))) / iterations, LARGEST_RANDOM)
+        return day_rnd, rng.random((iterations, days))
+    elif sampling == "Latin Hypercube":
+        # For each day, the chunk's iterations split [0, 1) into one slice each, in shuffled order.
+        strata = rng.permuted(np.broadcast_to(np.arange(iterations)[:, None], (2, iterations, days)), axis=1)
+        randoms = (strata + rng.random((2, iterations, days))) / iterations
+    else:
+        day_rnd = rng.random((iterations, days))
+        demand_rnd = rng.random((iterations, days))
+        return day_rnd, demand_rnd
+    randoms = np.minimum(randoms, LARGEST_RANDOM)
+    return randoms[0], randoms[1]
+
+
+def replicate_size(sampling):
+    # Antithetic pairs and stratified or Latin hypercube chunks are only independent as a whole, so they are the unit of variance.
+    return {"Antithetic": 2, "Stratified": CHUNK_SIZE, "Latin Hypercube": CHUNK_SIZE}.get(sampling, 1)
+
+
+def replicate_means(values, size):
+    starts = np.arange(0, len(values), size)
+    return np.add.reduceat(values, starts) / np.diff(np.append(starts, len(values)))
+
+
+def simulate_days(day_rnd, demand_rnd, quantity, p, c, s, tables, backend="NumPy"):
+    kernel = KERNELS[backend]
+    with span("Demand Lookup"):
+        day_type, demand = kernel.lookup(tables, day_rnd, demand_rnd)
+    with span("Profit Arithmetic"):
+        revenue, excess_demand, lost_profit, scraps, salvage, daily_profit = kernel.arithmetic(demand, quantity, p, c, s)
+    count("Simulated Days", demand.size)
+    count(f"{backend} Kernel Days", demand.size)
+    columns = {
+        "Day Random": day_rnd, "Day Type": day_type, "Demand Random": demand_rnd, "Demand": demand,
+        "Revenue": revenue, "Excess Demand": excess_demand, "Lost Profit": lost_profit,
+        "Scraps": scraps, "Salvage": salvage, "Daily Profit": daily_profit
+    }
+    # Backends may compute in wider integers; the stored columns always have the same dtypes.
+    return {name: np.asarray(values, dtype=COLUMN_DTYPES[name]) for name, values in columns.items()}
+
+
+def profit_summary(daily_profit):
+    daily_profit = np.asarray(daily_profit)
+    return {
+        "Total Profit": sequential_sum(daily_profit), "Min Daily Profit": daily_profit.min(axis=1),
+        "Max Daily Profit": daily_profit.max(axis=1), "Daily Profit Stats": RunningStats().update(daily_profit)
+    }
+
+
+def merge_summaries(parts):
+    merged = {name: np.concatenate([part[name] for part in parts]) if parts else np.empty(0)
+              for name in ("Total Profit", "Min Daily Profit", "Max Daily Profit")}
+    merged["Daily Profit Stats"] = RunningStats()
+    for part in parts:
+        merged["Daily Profit Stats"].merge(part["Daily Profit Stats"])
+    return merged
+
+
+def column_summary(daily_profit, days):
+    # Block by block, so a memory-mapped column is never read in one piece.
+    block = max(1, STORE_BLOCK_CELLS // max(days, 1))
+    return merge_summaries([profit_summary(daily_profit[start:start + block]) for start in range(0, len(daily_profit), block)])
+
+
+def day_profit_means(daily_profit, days):
+    # Average profit of each day of the horizon over all iterations, read block by block like column_summary.
+    block = max(1, STORE_BLOCK_CELLS // max(days, 1))
+    totals = np.zeros(days)
+    for start in range(0, len(daily_profit), block):
+        totals += np.asarray(daily_profit[start:start + block]).sum(axis=0)
+    return totals / max(len(daily_profit), 1)
+
+
+def as_column(column, dtype):
+    return column if isinstance(column, MappedColumn) else np.asarray(column, dtype=dtype)
+
+
+def profit_distribution(params):
+    # Every day's profit lies between selling nothing and selling the whole order, which fixes the histogram range.
+    q, p, c, s = params["Quantity"], params["Paper Sell Price"], params["Paper Cost"], params["Scrap Sale Price"]
+    bounds = (params["Days"] * q * (s - c), params["Days"] * q * (p - c))
+    return ProfitDistribution(min(bounds), max(bounds))
+
+
+class ResultStore:
+    def __init__(self, columns, day_types, days, summary=None, directory=None, distribution=None):
+        self.columns = {name: as_column(columns[name], dtype) for name, dtype in COLUMN_DTYPES.items()}
+        self.day_types = list(day_types)
+        self.days = days
+        self.directory = directory
+        summary = column_summary(self.columns["Daily Profit"], days) if summary is None else summary
+        self.total_profit = summary["Total Profit"]
+        self.average_profit = self.total_profit / days
+        self.min_daily_profit = summary["Min Daily Profit"]
+        self.max_daily_profit = summary["Max Daily Profit"]
+        self.daily_profit_stats = summary["Daily Profit Stats"]
+        self.profit_distribution = distribution
+
+    def __len__(self):
+        return len(self.total_profit)
+
+    def __getitem__(self, iteration):
+        return {name: column[iteration] for name, column in self.columns.items()}
+
+    def day_type_names(self, iteration, start=0, stop=None):
+        return [self.day_types[code] for code in self.columns["Day Type"][iteration, start:stop].tolist()]
+
+    def rows(self, iteration, start=0, stop=None):
+        stop = self.days if stop is None else stop
+        return zip(range(start + 1, stop + 1), self.day_type_names(iteration, start, stop), *(
+            self.columns[name][iteration, start:stop].tolist()
+            for name in ("Demand", "Revenue", "Excess Demand", "Lost Profit", "Scraps", "Salvage", "Daily Profit")
+        ))
+
+
+def simulate_chunk(params, cum_demand_dist, chunk, backend="NumPy"):
+    index, start, stop = chunk
+    tables = lookup_tables(params, cum_demand_dist)
+    with span("Random Draws"):
+        day_rnd, demand_rnd = draw_randoms(chunk_rng(params["Seed"], index), stop - start, params["Days"], params.get("Sampling", "Plain"))
+    part = simulate_days(day_rnd, demand_rnd, params["Quantity"], params["Paper Sell Price"],
+                         params["Paper Cost"], params["Scrap Sale Price"], tables, backend)
+    # Sketched in the worker; the parent only merges, so nothing here grows with the iteration count.
+    with span("Profit Sketch"):
+        part["Profit Distribution"] = profit_distribution(params).update(sequential_sum(part["Daily Profit"]))
+    return part
+
+
+def concatenate_columns(parts):
+    return {name: np.concatenate([part[name] for part in parts]) for name in COLUMN_DTYPES}
+
+
+def map_chunks(function, chunks, workers=1):
+    # Yields (chunk, result) in chunk order; with a pool, at most two chunks per worker are in flight.
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield chunk, function(chunk)
+        return
+    tracing = TRACER.enabled
+    if tracing:
+        function = partial(traced_call, function)
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(chunks)))
+
+    def result(future):
+        if not tracing:
+            return future.result()
+        value, events, counters = future.result()
+        TRACER.merge(events, counters)
+        return value
+    try:
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, executor.submit(function, chunk)))
+            if len(pending) >= 2 * workers:
+                chunk, future = pending.popleft()
+                yield chunk, result(future)
+        while pending:
+            chunk, future = pending.popleft()
+            yield chunk, result(future)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def progress_report(done, total, started, stats=None):
+    elapsed = time.perf_counter() - started
+    report = {
+        "Iterations Done": done, "Iterations Total": total, "Elapsed": elapsed,
+        "Remaining": elapsed * (total - done) / done if done else float("nan")
+    }
+    if stats is not None:
+        report["Average Daily Profit"] = stats.mean
+        report["Confidence Half-Width"] = stats.half_width(CONFIDENCE)
+    return report
+
+
+def open_store(directory, summary=None, distribution=None):
+    columns, day_types, days = open_columns(directory, COLUMN_DTYPES)
+    return ResultStore(columns, day_types, days, summary, directory, distribution)
+
+
+def simulate(params, cum_demand_dist, workers=1, progress=None, cancel=None, directory=None, backend="Auto"):
+    # With a directory, each chunk is written straight into memory-mapped column files and only per-iteration
+    # summaries stay in memory; the store maps the files back lazily.
+    target = params.get("Target Half-Width")
+    size = replicate_size(params.get("Sampling", "Plain"))
+    stats = RunningStats()
+    parts = []
+    distribution = profit_distribution(params)
+    done = 0
+    columns = create_columns(directory, COLUMN_DTYPES, params["Iterations"], params["Days"]) if directory else None
+    started = time.perf_counter()
+    function = partial(simulate_chunk, params, cum_demand_dist, backend=choose_backend(params["Days"], params["Iterations"], backend))
+    with closing(map_chunks(function, iteration_chunks(params["Iterations"]), workers)) as results:
+        for (_, start, stop), part in results:
+            if columns is None:
+                parts.append(part)
+            else:
+                with span("Disk Writes"):
+                    for name, column in columns.items():
+                        column.write(start, part[name])
+                parts.append(profit_summary(part["Daily Profit"]))
+            distribution.merge(part["Profit Distribution"])
+            done = stop
+            count("Chunks")
+            stats.update(replicate_means(sequential_sum(part["Daily Profit"]) / params["Days"], size))
+            if progress is not None:
+                progress(progress_report(stop, params["Iterations"], started, stats))
+            # Stopping only looks at chunks in order, so where a run stops does not depend on workers.
+            if target and stats.count > 1 and stats.half_width(CONFIDENCE) <= target:
+                break
+            if cancel is not None and cancel.is_set():
+                break
+    with span("Result Store"):
+        if columns is None:
+            return ResultStore(concatenate_columns(parts), sorted(params["Day Type Probabilities"]), params["Days"], distribution=distribution)
+        save_metadata(directory, sorted(params["Day Type Probabilities"]), params["Days"], done)
+        return open_store(directory, merge_summaries(parts), distribution)
+
+
+def chunk_demand(params, cum_demand_dist, chunk, backend="NumPy"):
+    index, start, stop = chunk
+    tables = lookup_tables(params, cum_demand_dist)
+    with span("Random Draws"):
+        day_rnd, demand_rnd = draw_randoms(chunk_rng(params["Seed"], index), stop - start, params["Days"], params.get("Sampling", "Plain"))
+    with span("Demand Lookup"):
+        return np.asarray(KERNELS[backend].lookup(tables, day_rnd, demand_rnd)[1], dtype=COLUMN_DTYPES["Demand"])
+
+
+def quantity_profits(params, demand, quantities):
+    # Average daily profit of every iteration for every quantity, shape (quantities, iterations).
+    p, c, s = params["Paper Sell Price"], params["Paper Cost"], params["Scrap Sale Price"]
+    quantities = np.asarray(quantities, dtype=np.int64)
+    batch = max(1, SWEEP_BATCH_CELLS // max(demand.size, 1))
+    iteration_profits = np.empty((len(quantities), len(demand)))
+    for first in range(0, len(quantities), batch):
+        # Every quantity is scored against the same demand matrix (common random numbers).
+        q = quantities[first:first + batch, None, None]
+        with span("Profit Arithmetic"):
+            daily_profit = np.minimum(demand, q) * p - (q * c) + np.maximum(0, q - demand) * s
+            iteration_profits[first:first + batch] = sequential_sum(daily_profit) / params["Days"]
+    count("Simulated Days", demand.size * len(quantities))
+    return iteration_profits
+
+
+def sweep_chunk(params, cum_demand_dist, chunk, quantities, backend="NumPy"):
+    return quantity_profits(params, chunk_demand(params, cum_demand_dist, chunk, backend), quantities)
+
+
+def sweep_iteration_profits(params, cum_demand_dist, quantities, workers=1, progress=None, cancel=None, backend="Auto"):
+    # The backend draws the demand; scoring every quantity against it stays one batched array expression.
+    function = partial(sweep_chunk, params, cum_demand_dist, quantities=quantities,
+                       backend=choose_backend(params["Days"], params["Iterations"], backend))
+    parts = []
+    started = time.perf_counter()
+    with closing(map_chunks(function, iteration_chunks(params["Iterations"]), workers)) as results:
+        for (_, _, stop), part in results:
+            parts.append(part)
+            if progress is not None:
+                progress(progress_report(stop, params["Iterations"], started))
+            if cancel is not None and cancel.is_set():
+                break
+    return np.concatenate(parts, axis=1)
+
+
+def sweep_quantities(params, cum_demand_dist, quantities, workers=1, progress=None, cancel=None, backend="Auto"):
+    iteration_profits = sweep_iteration_profits(params, cum_demand_dist, quantities, workers, progress, cancel, backend)
+    return sequential_sum(iteration_profits) / iteration_profits.shape[1]
+
+
+def summarize(total_profits, days):
+    iterations = len(total_profits)
+    avg_total_profit = float(sequential_sum(total_profits)) / iterations
+    return {
+        "Average Total Profit": avg_total_profit, "Average Daily Profit": avg_total_profit / days,
+        "Min Profit": float(np.min(total_profits)), "Max Profit": float(np.max(total_profits))
+    }
+
+
+def period_profit_stats(daily_profit, periods):
+    # Pooled daily-profit statistics for each schedule period, read block by block like column_summary.
+    block = max(1, STORE_BLOCK_CELLS // max(len(periods), 1))
+    stats = [RunningStats() for _ in range(int(periods.max()) + 1)]
+    for start in range(0, len(daily_profit), block):
+        values = np.asarray(daily_profit[start:start + block])
+        for period, period_stats in enumerate(stats):
+            period_stats.update(values[:, periods == period])
+    return stats
+
+
+def variance_reduction(store, stats, schedule=None):
+    # Every day is marginally a plain draw and the days of an iteration would be independent under plain sampling, so
+    # the daily variances add up to what plain sampling would have reached. Days of one schedule period share a
+    # distribution and pool their variance; without a schedule, all days do.
+    if stats.count < 2 or not stats.variance:
+        return float("nan")
+    if schedule:
+        periods = day_periods(schedule, store.days)
+        days = np.bincount(periods)
+        day_variance = sum(days[period] * period_stats.variance
+                           for period, period_stats in enumerate(period_profit_stats(store.columns["Daily Profit"], periods)) if days[period])
+    else:
+        day_variance = store.daily_profit_stats.variance * store.days
+    plain_variance = day_variance / store.days ** 2 / len(store)
+    return plain_variance / stats.std_error ** 2
+
+
+def build_results(params, store):
+    summary = dict(summarize(store.total_profit, params["Days"]), Quantity=params["Quantity"])
+    stats = RunningStats().update(replicate_means(store.average_profit, replicate_size(params.get("Sampling", "Plain"))))
+    summary["Confidence Half-Width"] = stats.half_width(CONFIDENCE)
+    summary["Variance Reduction"] = variance_reduction(store, stats, params.get("Day Type Schedule"))
+    summary["Iterations Used"] = len(store)
+    # Stores reloaded from the cache carry no sketch; their totals rebuild the same one.
+    distribution = store.profit_distribution or profit_distribution(params).update(store.total_profit)
+    summary.update(distribution.summary())
+    results = {"Parameters": params, "Iterations": store, "Summary": summary, "Profit Distribution": distribution}
+    if params.get("Day Type Schedule"):
+        results["Period Breakdown"] = period_breakdown(params["Day Type Schedule"], day_profit_means(store.columns["Daily Profit"], store.days))
+    return results
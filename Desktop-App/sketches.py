@@ -0,0 +1,114 @@
+import math
+import numpy as np
+
+RISK_QUANTILES = {"P5": 0.05, "P50": 0.50, "P95": 0.95}
+HISTOGRAM_BINS = 400
+
+
+class QuantileSketch:
+    # DDSketch (Masson et al., 2019): log-spaced buckets keep every quantile within relative_accuracy of the true
+    # value. Merging adds bucket counts, so the sketch does not depend on how the stream was split across workers,
+    # and its size is bounded by the value range, not by how many values went in.
+    def __init__(self, relative_accuracy=0.005, min_value=0.005):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.positive = {}
+        self.negative = {}
+        self.zero = 0
+        self.count = 0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def add_keys(self, store, magnitudes):
+        keys, counts = np.unique(np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64), return_counts=True)
+        for key, n in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + n
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return self
+        self.add_keys(self.positive, values[values >= self.min_value])
+        self.add_keys(self.negative, -values[values <= -self.min_value])
+        self.zero += int((np.abs(values) < self.min_value).sum())
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        return self
+
+    def merge(self, other):
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, n in other_store.items():
+                store[key] = store.get(key, 0) + n
+        self.zero += other.zero
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def bucket_value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantiles(self, qs):
+        qs = np.asarray(qs, dtype=np.float64)
+        if not self.count:
+            return np.full(qs.shape, np.nan)
+        negative, positive = sorted(self.negative, reverse=True), sorted(self.positive)
+        values = np.array([-self.bucket_value(k) for k in negative] + [0.0] + [self.bucket_value(k) for k in positive])
+        counts = np.array([self.negative[k] for k in negative] + [self.zero] + [self.positive[k] for k in positive])
+        index = np.searchsorted(np.cumsum(counts), qs * (self.count - 1), side="right")
+        return np.clip(values[np.minimum(index, len(values) - 1)], self.min, self.max)
+
+    def __len__(self):
+        return len(self.positive) + len(self.negative) + 1
+
+
+class FixedHistogram:
+    # Bin edges are fixed up front, so histograms from different workers merge by adding counts.
+    def __init__(self, low, high, bins=HISTOGRAM_BINS):
+        high = high if high > low else low + 1.0
+        self.edges = np.linspace(low, high, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    def update(self, values):
+        values = np.clip(np.asarray(values, dtype=np.float64).ravel(), self.edges[0], self.edges[-1])
+        self.counts += np.histogram(values, self.edges)[0]
+        return self
+
+    def merge(self, other):
+        self.counts += other.counts
+        return self
+
+
+class ProfitDistribution:
+    # Total profit per iteration: quantiles from the sketch, shape from the histogram, and an exact loss count.
+    def __init__(self, low, high, bins=HISTOGRAM_BINS):
+        self.sketch = QuantileSketch()
+        self.histogram = FixedHistogram(low, high, bins)
+        self.losses = 0
+
+    def update(self, totals):
+        totals = np.asarray(totals, dtype=np.float64).ravel()
+        self.sketch.update(totals)
+        self.histogram.update(totals)
+        self.losses += int((totals < 0).sum())
+        return self
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        self.histogram.merge(other.histogram)
+        self.losses += other.losses
+        return self
+
+    @property
+    def count(self):
+        return self.sketch.count
+
+    def summary(self):
+        quantiles = dict(zip(RISK_QUANTILES, self.sketch.quantiles(list(RISK_QUANTILES.values())).tolist()))
+        # Value at risk is the loss not exceeded with 95% confidence; negative means even P5 is a profit.
+        return dict(quantiles, **{
+            "Value at Risk (95%)": -quantiles["P5"],
+            "Probability of Loss": self.losses / self.count if self.count else float("nan")
+        })
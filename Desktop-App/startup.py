@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+import json
+import os
+import subprocess
+import sys
+import time
+
+GUI_MODULES = ["tkinter", "customtkinter", "matplotlib", "PIL", "CTkMessagebox"]
+HEADLESS_MODULES = ["simulation", "analytic", "distributions", "optimizer", "sensitivity", "export", "cache", "diskstore",
+                    "sketches", "schedules", "batch", "fleet", "benchmarks", "service"]
+
+
+class StartupTimer:
+    # Wall time per startup phase; each mark closes the phase that began at the previous one.
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.phases = {}
+        self.deferred = {}
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    @contextmanager
+    def defer(self, phase):
+        # Work moved off the startup path is still timed, so the cost shows up where it was moved to.
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.deferred[phase] = self.deferred.get(phase, 0.0) + time.perf_counter() - started
+
+    def report(self):
+        return {"Phases": dict(self.phases), "Total": sum(self.phases.values()), "Deferred": dict(self.deferred),
+                "GUI Modules Loaded": gui_modules()}
+
+    def format(self):
+        return f"Startup {sum(self.phases.values()):.2f}s: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.phases.items())
+
+
+def gui_modules():
+    return [name for name in GUI_MODULES if name in sys.modules]
+
+
+def check_headless_imports(modules=HEADLESS_MODULES):
+    # Each module is imported in a fresh interpreter, so nothing the caller already loaded can hide a dependency. It
+    # runs next to this file, so the app modules import from wherever the check is started.
+    leaks, failures = {}, {}
+    for module in modules:
+        code = f"import json, sys, {module}; print(json.dumps([m for m in {GUI_MODULES!r} if m in sys.modules]))"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode:
+            failures[module] = (result.stderr.strip().splitlines() or [f"exit status {result.returncode}"])[-1]
+        elif loaded := json.loads(result.stdout):
+            leaks[module] = loaded
+    return leaks, failures
+
+
+def main():
+    leaks, failures = check_headless_imports()
+    for module, error in failures.items():
+        print(f"{module} failed to import: {error}")
+    for module, loaded in leaks.items():
+        print(f"{module} pulls in {', '.join(loaded)}")
+    if failures:
+        print("Some simulation modules could not be imported.")
+    else:
+        print("No GUI modules are imported by the simulation logic." if not leaks else "GUI imports leaked into headless modules.")
+    sys.exit(1 if leaks or failures else 0)
+
+
+if __name__ == "__main__":
+    main()
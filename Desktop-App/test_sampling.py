@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+from analytic import expected_outcomes
+from distributions import DemandTables
+from kernels import KERNELS, check_conformance
+from schedules import parse_schedule
+from sensitivity import sensitivity_grid
+from simulation import (DEFAULT_DEMAND_DIST, DEFAULT_PARAMETERS, SAMPLING_MODES, build_results, chunk_rng, cumulative_day_type_probs,
+                        cumulative_demand_dist, draw_randoms, iteration_chunks, simulate)
+
+
+def run(sampling, iterations=4000, days=30):
+    params = dict(DEFAULT_PARAMETERS, Days=days, Iterations=iterations, Seed=2024, Sampling=sampling)
+    return build_results(params, simulate(params, DemandTables(cumulative_demand_dist(DEFAULT_DEMAND_DIST))))
+
+
+def test_variance_reduction_keeps_total_profit_spread():
+    # Each mode may only correlate iterations; every iteration must still be a random horizon, so the spread of
+    # total profit and its quantiles have to match plain sampling.
+    plain = run("Plain")
+    plain_std = plain["Iterations"].total_profit.std()
+    for sampling in SAMPLING_MODES[1:]:
+        results = run(sampling)
+        std = results["Iterations"].total_profit.std()
+        assert abs(std / plain_std - 1) < 0.1, f"{sampling}: std {std:.1f} against {plain_std:.1f}"
+        for quantile in ("P5", "P95"):
+            assert abs(results["Summary"][quantile] - plain["Summary"][quantile]) < 0.3 * plain_std, f"{sampling}: {quantile}"
+
+
+def test_stratified_day_types_cover_every_slice():
+    # Per day, a full chunk's day-type randoms fall one into each 1/64 slice of [0, 1).
+    store = run("Stratified", iterations=64, days=5)["Iterations"]
+    slices = np.sort(np.floor(np.asarray(store.columns["Day Random"]) * 64), axis=0)
+    assert np.array_equal(slices, np.broadcast_to(np.arange(64)[:, None], slices.shape))
+
+
+def test_sensitivity_grid_uses_the_schedule_mix():
+    params = dict(DEFAULT_PARAMETERS, Days=30, Iterations=2000, Seed=7)
+    params["Day Type Schedule"] = parse_schedule({"Periods": [{"Days": 1, "Day Type Probabilities": {"Good": 1.0}}]},
+                                                 params["Day Type Probabilities"])
+    tables = DemandTables(cumulative_demand_dist(DEFAULT_DEMAND_DIST))
+    axes = {"Paper Sell Price": [params["Paper Sell Price"]], "Good Day Probability": [1.0]}
+    grid = sensitivity_grid(params, tables, axes)
+    exact = expected_outcomes(params, tables, [params["Quantity"]])["Expected Profit"][0]
+    assert grid["Base"]["Good Day Probability"] == 1.0
+    assert abs(grid["Expected Profit"][0, 0] - exact) < 0.05
+
+
+@pytest.mark.parametrize("backend", ["NumPy", "Numba"])
+def test_kernel_backends_match_the_python_reference(backend):
+    if backend not in KERNELS:
+        pytest.skip(f"{backend} is not installed")
+    assert check_conformance(iterations=16, days=10, backends=[backend]) == []
+
+
+def original_loop(params, cum_demand_dist, day_rnds, demand_rnds):
+    # The per-day loop the app started from, fed the engine's random numbers instead of random.random().
+    p, c, s, quantity = params["Paper Sell Price"], params["Paper Cost"], params["Scrap Sale Price"], params["Quantity"]
+    cum_day_type_prob = cumulative_day_type_probs(params["Day Type Probabilities"])
+    days, totals = [], []
+    for day_row, demand_row in zip(day_rnds, demand_rnds):
+        iteration_results = []
+        for day_rnd, demand_rnd in zip(day_row, demand_row):
+            day_type = "Poor"
+            for dtype, cum_prob in cum_day_type_prob.items():
+                if day_rnd < cum_prob:
+                    day_type = dtype
+                    break
+            demand = 0
+            for d, cum_prob in sorted(cum_demand_dist[day_type].items()):
+                if demand_rnd < cum_prob:
+                    demand = d
+                    break
+            revenue = min(demand, quantity) * p
+            excess_demand = max(0, demand - quantity)
+            num_scraps = max(0, quantity - demand)
+            salvage = num_scraps * s
+            daily_profit = revenue - (quantity * c) + salvage
+            iteration_results.append((day_type, demand, revenue, excess_demand, num_scraps, salvage, daily_profit))
+        days.append(iteration_results)
+        totals.append(sum(result[-1] for result in iteration_results))
+    return days, totals
+
+
+@pytest.mark.parametrize("sampling", SAMPLING_MODES)
+def test_simulate_matches_the_original_loop(sampling):
+    params = dict(DEFAULT_PARAMETERS, Days=30, Iterations=150, Seed=11, Sampling=sampling)
+    cum_demand_dist = cumulative_demand_dist(DEFAULT_DEMAND_DIST)
+    store = simulate(params, DemandTables(cum_demand_dist))
+    draws = [draw_randoms(chunk_rng(params["Seed"], index), stop - start, params["Days"], sampling)
+             for index, start, stop in iteration_chunks(params["Iterations"])]
+    day_rnds, demand_rnds = (np.concatenate(part) for part in zip(*draws))
+    days, totals = original_loop(params, cum_demand_dist, day_rnds.tolist(), demand_rnds.tolist())
+    columns = {name: np.asarray(store.columns[name]) for name in ("Day Type", "Demand", "Revenue", "Excess Demand", "Scraps", "Salvage",
+                                                                   "Daily Profit")}
+    assert np.array_equal(store.columns["Day Random"], day_rnds) and np.array_equal(store.columns["Demand Random"], demand_rnds)
+    expected = np.array([[[store.day_types.index(day[0]), *day[1:]] for day in iteration] for iteration in days])
+    for position, (name, column) in enumerate(columns.items()):
+        assert np.array_equal(column, expected[..., position]), name
+    assert store.total_profit.tolist() == totals
+
+
+def test_plain_sampling_reports_no_variance_reduction_under_a_schedule():
+    # Weekdays always poor and weekends always good: the pooled daily variance would count the gap between them as noise.
+    weekdays = {day: {"Poor": 1.0} for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]}
+    weekdays.update({day: {"Good": 1.0} for day in ["Saturday", "Sunday"]})
+    params = dict(DEFAULT_PARAMETERS, Days=28, Iterations=4000, Seed=3)
+    params["Day Type Schedule"] = parse_schedule({"Weekdays": weekdays}, params["Day Type Probabilities"])
+    results = build_results(params, simulate(params, DemandTables(cumulative_demand_dist(DEFAULT_DEMAND_DIST))))
+    assert abs(results["Summary"]["Variance Reduction"] - 1) < 0.15
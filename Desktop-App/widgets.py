@@ -0,0 +1,71 @@
+from tkinter import ttk
+from profiling import count, span
+
+
+class VirtualTable:
+    def __init__(self, container, columns, height=15):
+        self.tree = ttk.Treeview(container, columns=columns, show="headings", height=height, selectmode="browse")
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=100, anchor="center")
+        self.y_scrollbar = ttk.Scrollbar(container, orient="vertical", command=self.on_scroll)
+        self.x_scrollbar = ttk.Scrollbar(container, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.x_scrollbar.set)
+        self.page_size = height
+        self.row_count = 0
+        self.first = 0
+        self.fetch_rows = None
+        self.items = []
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll_by(-1 if e.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda e: self.scroll_by(-1, "units"))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_by(1, "units"))
+        self.tree.bind("<Prior>", lambda e: self.scroll_by(-1, "pages"))
+        self.tree.bind("<Next>", lambda e: self.scroll_by(1, "pages"))
+
+    def grid(self, row=0, column=0):
+        self.tree.grid(row=row, column=column, sticky="nsew")
+        self.y_scrollbar.grid(row=row, column=column + 1, sticky="ns")
+        self.x_scrollbar.grid(row=row + 1, column=column, sticky="ew")
+
+    def set_source(self, row_count, fetch_rows):
+        # fetch_rows(start, stop) returns formatted rows for that slice only.
+        self.row_count = row_count
+        self.fetch_rows = fetch_rows
+        self.first = 0
+        self.refresh()
+
+    def refresh(self):
+        self.first = max(0, min(self.first, self.row_count - self.page_size))
+        with span("Table Refresh"):
+            rows = self.fetch_rows(self.first, min(self.first + self.page_size, self.row_count)) if self.fetch_rows else []
+            while len(self.items) < len(rows):
+                self.items.append(self.tree.insert("", "end"))
+            while len(self.items) > len(rows):
+                self.tree.delete(self.items.pop())
+            for item, values in zip(self.items, rows):
+                self.tree.item(item, values=values)
+        count("Table Rows Formatted", len(rows))
+        if self.row_count:
+            self.y_scrollbar.set(self.first / self.row_count, (self.first + len(rows)) / self.row_count)
+        else:
+            self.y_scrollbar.set(0, 1)
+
+    def scroll_by(self, amount, what):
+        self.first += amount * (self.page_size if what == "pages" else 1)
+        self.refresh()
+        return "break"
+
+    def on_scroll(self, action, *args):
+        if action == "moveto":
+            self.first = int(float(args[0]) * self.row_count)
+            self.refresh()
+        elif action == "scroll":
+            self.scroll_by(int(args[0]), args[1])
+
+    def on_resize(self, event):
+        row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        page_size = max(1, (event.height - row_height - 5) // row_height)
+        if page_size != self.page_size:
+            self.page_size = page_size
+            self.refresh()